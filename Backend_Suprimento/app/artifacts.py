@@ -0,0 +1,221 @@
+import os
+import re
+import time
+import logging
+import tempfile
+import threading
+import contextlib
+import typing
+
+try:
+    import fcntl          # lock entre workers do gunicorn (POSIX)
+except ImportError:       # Windows: cada processo varre sozinho
+    fcntl = None
+
+
+# =========================
+# Config
+# =========================
+ARTIFACT_DIR       = os.getenv("ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "suprimento"))
+ARTIFACT_MAX_BYTES = int(os.getenv("ARTIFACT_MAX_BYTES", str(512 * 1024 * 1024)))  # 512 MB
+ARTIFACT_TTL_S     = int(os.getenv("ARTIFACT_TTL_S", "3600"))      # 1h de vida por artefato
+ARTIFACT_SWEEP_S   = int(os.getenv("ARTIFACT_SWEEP_S", "300"))     # varredura a cada 5 min
+TMP_PREFIX         = "tmp_"                                        # arquivos em uso (uploads)
+SWEEP_LOCK         = ".sweep.lock"                                 # arquivos "." não são artefatos
+
+_SAFE_NAME = re.compile(r"^[0-9A-Za-z][0-9A-Za-z._-]*$")
+
+
+def safe_filename(s: str) -> str:
+    """Troca qualquer caractere fora de [0-9A-Za-z._-] por '_' (evita path traversal)."""
+    s = re.sub(r"[^0-9A-Za-z._-]", "_", s or "").lstrip("._-")
+    return s or "arquivo"
+
+
+# =====================================
+# Store de artefatos (uploads temporários + sentenças geradas)
+# =====================================
+class ArtifactStore:
+    """
+    Diretório gerenciado para tudo que o serviço grava em disco.
+    - raiz configurável (ARTIFACT_DIR), fora da raiz do /tmp
+    - limite de tamanho total (evicção dos mais antigos)
+    - TTL com varredura em thread de fundo
+    - temp_file() garante a remoção mesmo quando o processamento falha
+    Com `state` (SharedState) os contadores valem para todos os workers, e só um
+    worker por vez faz a varredura.
+    """
+
+    def __init__(self, root: str = ARTIFACT_DIR, max_bytes: int = ARTIFACT_MAX_BYTES,
+                 ttl_s: int = ARTIFACT_TTL_S, sweep_interval_s: int = ARTIFACT_SWEEP_S,
+                 state=None):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.sweep_interval_s = sweep_interval_s
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: typing.Optional[threading.Thread] = None
+        self._counters = {"evictions": 0, "expired": 0, "sweeps": 0}
+        self.state = state
+
+    def _incr(self, name: str, n: int = 1) -> None:
+        if not n:
+            return
+        if self.state is not None:
+            self.state.incr(f"artifact.{name}", n)
+            return
+        with self._lock:
+            self._counters[name] += n
+
+    # ---------- Caminhos ----------
+    def path(self, name: str) -> str:
+        """Caminho absoluto de um artefato; recusa nomes que saiam da raiz."""
+        if not name or not _SAFE_NAME.match(name):
+            raise ValueError(f"Nome de artefato inválido: {name!r}")
+        return os.path.join(self.root, name)
+
+    def exists(self, name: str) -> bool:
+        try:
+            return os.path.isfile(self.path(name))
+        except ValueError:
+            return False
+
+    def touch(self, name: str) -> None:
+        """Renova o mtime (reinicia o TTL) de um artefato reutilizado."""
+        with contextlib.suppress(FileNotFoundError, ValueError):
+            os.utime(self.path(name))
+
+    def remove(self, name: str) -> None:
+        with contextlib.suppress(FileNotFoundError, ValueError):
+            os.unlink(self.path(name))
+
+    @contextlib.contextmanager
+    def temp_file(self, suffix: str = "") -> typing.Iterator[str]:
+        """
+        Cria um arquivo temporário dentro da raiz e devolve o caminho.
+        O arquivo é apagado na saída do bloco, com ou sem exceção.
+        """
+        fd, tmp_path = tempfile.mkstemp(prefix=TMP_PREFIX, suffix=suffix, dir=self.root)
+        os.close(fd)
+        try:
+            yield tmp_path
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(tmp_path)
+
+    def commit(self, name: str) -> str:
+        """Registra um artefato recém gravado e aplica o limite de tamanho."""
+        p = self.path(name)
+        self._enforce_cap(keep=p)
+        return p
+
+    # ---------- Limpeza ----------
+    def _entries(self) -> list[tuple[str, float, int]]:
+        out = []
+        with os.scandir(self.root) as it:
+            for e in it:
+                if e.name.startswith("."):
+                    continue
+                try:
+                    if not e.is_file(follow_symlinks=False):
+                        continue
+                    st = e.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    continue
+                out.append((e.path, st.st_mtime, st.st_size))
+        return out
+
+    def _unlink(self, path: str) -> bool:
+        try:
+            os.unlink(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _enforce_cap(self, keep: typing.Optional[str] = None) -> None:
+        entries = self._entries()
+        total = sum(sz for _, _, sz in entries)
+        if total <= self.max_bytes:
+            return
+        # mais antigos primeiro; uploads em andamento (tmp_) não são despejados aqui
+        for p, _, sz in sorted(entries, key=lambda e: e[1]):
+            if total <= self.max_bytes:
+                break
+            if p == keep or os.path.basename(p).startswith(TMP_PREFIX):
+                continue
+            if self._unlink(p):
+                total -= sz
+                self._incr("evictions")
+
+    @contextlib.contextmanager
+    def _sweep_lock(self) -> typing.Iterator[bool]:
+        """True se este processo pegou o lock de varredura (não bloqueia)."""
+        if fcntl is None:
+            yield True
+            return
+        with open(os.path.join(self.root, SWEEP_LOCK), "a") as fh:
+            try:
+                fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def sweep(self) -> None:
+        """Remove artefatos com mais de ttl_s e depois aplica o limite de tamanho."""
+        with self._sweep_lock() as dono:
+            if not dono:
+                return                      # outro worker já está varrendo
+            limite = time.time() - self.ttl_s
+            expired = 0
+            for p, mtime, _ in self._entries():
+                if mtime < limite and self._unlink(p):
+                    expired += 1
+            self._incr("expired", expired)
+            self._incr("sweeps")
+            self._enforce_cap()
+            if self.state is not None:
+                self.state.purge()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.sweep_interval_s):
+            try:
+                self.sweep()
+            except Exception:
+                logging.exception("Erro na varredura de artefatos em %s", self.root)
+
+    def start(self) -> None:
+        """Inicia a thread de varredura (idempotente)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="artifact-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    # ---------- Métricas ----------
+    def stats(self) -> dict:
+        entries = self._entries()
+        if self.state is not None:
+            counters = {**dict.fromkeys(self._counters, 0), **self.state.counters("artifact.")}
+        else:
+            with self._lock:
+                counters = dict(self._counters)
+        return {
+            "root": self.root,
+            "bytes": sum(sz for _, _, sz in entries),
+            "files": len(entries),
+            "max_bytes": self.max_bytes,
+            "ttl_s": self.ttl_s,
+            **counters,
+        }
@@ -0,0 +1,110 @@
+import os
+import time
+import typing
+from dataclasses import dataclass, field
+
+
+# =========================
+# Config (0 desliga o limite)
+# =========================
+MAX_PAGES         = int(os.getenv("MAX_PAGES", "400"))            # páginas aceitas no upload (o preflight recusa acima)
+# OCR e pixels cobrem MAX_PAGES páginas escaneadas (um layout por página a 220 dpi, ~4,7 MP
+# em A4) mais o DPI alto (300 dpi, ~8,7 MP) de todas elas: documento aceito não estoura só pelo tamanho
+MAX_OCR_PAGES     = int(os.getenv("MAX_OCR_PAGES", str(2 * MAX_PAGES)))       # páginas/recortes que passam pelo OCR
+MAX_RASTER_MPIX   = float(os.getenv("MAX_RASTER_MPIX", str(14 * MAX_PAGES)))  # megapixels rasterizados por PDF
+MAX_PAGE_MPIX     = float(os.getenv("MAX_PAGE_MPIX", "40"))       # acima disso a página é rasterizada com DPI menor
+EXTRACT_DEADLINE_S = float(os.getenv("EXTRACT_DEADLINE_S", "240"))  # abaixo do timeout do gunicorn
+MAX_RSS_MB        = int(os.getenv("MAX_RSS_MB", "2048"))          # memória residente do worker
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_mb() -> float:
+    """Memória residente do processo, lida de /proc/self/statm (0 fora do Linux)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / 2**20
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+class BudgetExceeded(RuntimeError):
+    """Um dos limites do Budget acabou; `kind` diz qual (ocr_pages, pixels, deadline, rss)."""
+
+    def __init__(self, kind: str, detail: str = ""):
+        super().__init__(f"orçamento esgotado: {kind}" + (f" ({detail})" if detail else ""))
+        self.kind = kind
+
+
+# =====================================
+# Orçamento de uma extração
+# =====================================
+@dataclass
+class Budget:
+    """
+    Limites de uma chamada de process_pdf. O PDFContext cobra cada rasterização e
+    cada OCR antes de fazê-los; o primeiro limite estourado levanta BudgetExceeded
+    e fica registrado em `exceeded` (as cobranças seguintes falham na hora).
+    """
+    max_ocr_pages: int = MAX_OCR_PAGES
+    max_raster_mpix: float = MAX_RASTER_MPIX
+    max_page_mpix: float = MAX_PAGE_MPIX
+    deadline_s: float = EXTRACT_DEADLINE_S
+    max_rss_mb: int = MAX_RSS_MB
+    started: float = field(default_factory=time.monotonic)
+    ocr_pages: int = 0
+    raster_mpix: float = 0.0
+    exceeded: typing.Optional[str] = None
+
+    def fail(self, kind: str, detail: str = ""):
+        self.exceeded = self.exceeded or kind
+        raise BudgetExceeded(kind, detail)
+
+    def elapsed_s(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining_s(self) -> typing.Optional[float]:
+        """Segundos até o deadline (None = sem deadline); usado como timeout do poppler/tesseract."""
+        if not self.deadline_s:
+            return None
+        return max(0.0, self.deadline_s - self.elapsed_s())
+
+    def check(self):
+        """Deadline e memória: chamado entre etapas e antes de cada trabalho caro."""
+        if self.exceeded:
+            raise BudgetExceeded(self.exceeded)
+        if self.deadline_s and self.elapsed_s() >= self.deadline_s:
+            self.fail("deadline", f"{self.deadline_s:.0f}s")
+        if self.max_rss_mb:
+            rss = rss_mb()
+            if rss >= self.max_rss_mb:
+                self.fail("rss", f"{rss:.0f} MB")
+
+    def raster_dpi(self, width_pt: float, height_pt: float, dpi: int) -> int:
+        """
+        Cobra a rasterização de uma página (tamanho em pontos) e devolve o DPI a usar:
+        páginas gigantes descem de DPI até caber em max_page_mpix.
+        """
+        self.check()
+        mpix = (width_pt * dpi / 72) * (height_pt * dpi / 72) / 1e6
+        if self.max_page_mpix and mpix > self.max_page_mpix:
+            dpi = max(36, int(dpi * (self.max_page_mpix / mpix) ** 0.5))
+            mpix = (width_pt * dpi / 72) * (height_pt * dpi / 72) / 1e6
+        if self.max_raster_mpix and self.raster_mpix + mpix > self.max_raster_mpix:
+            self.fail("pixels", f"{self.raster_mpix + mpix:.0f} MP")
+        self.raster_mpix += mpix
+        return dpi
+
+    def charge_ocr(self):
+        self.check()
+        if self.max_ocr_pages and self.ocr_pages >= self.max_ocr_pages:
+            self.fail("ocr_pages", str(self.max_ocr_pages))
+        self.ocr_pages += 1
+
+    def as_dict(self) -> dict:
+        return {
+            "exceeded": self.exceeded,
+            "ocr_pages": self.ocr_pages,
+            "raster_mpix": round(self.raster_mpix, 1),
+            "elapsed_s": round(self.elapsed_s(), 2),
+        }
@@ -0,0 +1,106 @@
+import os
+import mmap
+import errno
+import hashlib
+import contextlib
+import typing
+from dataclasses import dataclass, field
+
+from .artifacts import ArtifactStore
+
+
+CHUNK = 1024 * 1024  # 1 MB
+
+
+class IntakeTooLarge(ValueError):
+    def __init__(self, size: int, max_bytes: int):
+        super().__init__(f"Arquivo muito grande ({size} bytes; limite {max_bytes})")
+        self.size = size
+        self.max_bytes = max_bytes
+
+
+# =====================================
+# Entrada do PDF (uma única cópia, no store)
+# =====================================
+@dataclass
+class Intake:
+    """
+    PDF recebido, pronto para o processamento.
+    `path` é um arquivo de verdade dentro do store: o spool do python-multipart é
+    um TemporaryFile sem nome, e um /proc/self/fd/N não abre nos subprocessos
+    (pdfinfo/pdftocairo, pdftotext). O arquivo some no close().
+    """
+    path: str
+    size: int
+    sha256: str
+    _stack: contextlib.ExitStack = field(default_factory=contextlib.ExitStack, repr=False)
+
+    def close(self):
+        self._stack.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+#Cópia do spool para o store feita pelo kernel (copy_file_range; em btrfs/xfs vira reflink,
+#sem copiar bloco nenhum). Sem ele (outro FS em kernel antigo, não-Linux) tenta o sendfile
+#e, por último, o laço pread/write.
+def _copy_fd(src: int, dst: int, size: int):
+    offset = 0
+    copy_range = getattr(os, "copy_file_range", None)
+    while offset < size:
+        try:
+            if copy_range is not None:
+                n = copy_range(src, dst, size - offset, offset, offset)
+            else:
+                os.lseek(dst, offset, os.SEEK_SET)
+                n = os.sendfile(dst, src, offset, size - offset)
+        except OSError as e:
+            if copy_range is not None and e.errno in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                copy_range = None
+                continue
+            if offset == 0 and e.errno in (errno.ENOSYS, errno.EINVAL, errno.ENOTSOCK, errno.EOPNOTSUPP):
+                break
+            raise
+        if n == 0:
+            break
+        offset += n
+    while offset < size:
+        chunk = os.pread(src, CHUNK, offset)
+        if not chunk:
+            break
+        os.pwrite(dst, chunk, offset)
+        offset += len(chunk)
+
+
+def open_intake(spooled: typing.BinaryIO, max_bytes: int, store: ArtifactStore) -> Intake:
+    """
+    Recebe o arquivo do UploadFile (SpooledTemporaryFile) e devolve um Intake.
+    - o tamanho vem do fstat: arquivo acima do limite é recusado antes de qualquer leitura
+    - a cópia no store sai do kernel (_copy_fd), sem passar os bytes pelo Python
+    - o hash lê o spool via mmap: as páginas acabaram de ser gravadas pelo
+      python-multipart e vêm do page cache, sem cópia para buffers do Python
+    """
+    fd = spooled.fileno()    # força o rollover do spool em memória para disco
+    spooled.flush()
+    size = os.fstat(fd).st_size
+    if size > max_bytes:
+        raise IntakeTooLarge(size, max_bytes)
+
+    stack = contextlib.ExitStack()
+    try:
+        path = stack.enter_context(store.temp_file(suffix=".pdf"))
+        with open(path, "wb") as out:
+            _copy_fd(fd, out.fileno(), size)
+        h = hashlib.sha256()
+        if size:
+            with mmap.mmap(fd, size, access=mmap.ACCESS_READ) as mm:
+                h.update(mm)
+        sha = h.hexdigest()
+    except BaseException:
+        stack.close()
+        raise
+    return Intake(path=path, size=size, sha256=sha, _stack=stack)
@@ -1,15 +1,62 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, UploadFile, File, HTTPException, Header
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from typing import Dict, Any, List
-import tempfile
+from contextlib import asynccontextmanager
+import asyncio
+import json
 import os
-from .processing import process_pdf
+import shutil
+import threading
+# .processing (pdfplumber, regex) é importado na primeira extração ou no warm-up
 from .odtGenerator import ODTGenerator
+from .artifacts import ArtifactStore
+from .intake import open_intake, IntakeTooLarge
+from .preflight import inspect_pdf, PreflightError
+from .scheduler import JobScheduler
+from .shared_state import SharedState
+from .warmup import warm_up
+from .budget import Budget, BudgetExceeded, MAX_PAGES
+from .profiling import profiled, should_profile, is_admin
 from pydantic import BaseModel
 
-app = FastAPI()
+# Estado visível para todos os workers (contadores, cache de resultados)
+shared_state = SharedState()
+
+# Diretório gerenciado para uploads temporários e sentenças geradas
+artifact_store = ArtifactStore(state=shared_state)
+
+# Resultado da extração por sha256 do PDF (0 desliga)
+RESULT_CACHE_TTL_S = int(os.getenv("RESULT_CACHE_TTL_S", "3600"))
+# Estado da extração (texto, OCR) guardado para recalcular um campo sozinho (0 desliga)
+DOC_STATE_TTL_S = int(os.getenv("DOC_STATE_TTL_S", "900"))
+# WARMUP=1: no startup, em segundo plano, importa/compila/carrega o que o 1º request usaria
+WARMUP = os.getenv("WARMUP", "0") == "1"
+
+# Pool único de processamento: baratos primeiro, escaneados com teto de threads
+SCAN_HEAVY_RATIO = float(os.getenv("SCAN_HEAVY_RATIO", "0.5"))   # fração de páginas só-imagem
+SCAN_HEAVY_PAGES = int(os.getenv("SCAN_HEAVY_PAGES", "10"))
+MAX_BATCH_FILES  = int(os.getenv("MAX_BATCH_FILES", "50"))
+scheduler = JobScheduler()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    artifact_store.sweep()   # limpa o que sobrou de uma execução anterior
+    artifact_store.start()
+    if WARMUP:
+        # em thread: o servidor já aceita conexões; um request que chegue antes
+        # só espera o import que o warm-up estiver fazendo
+        threading.Thread(target=run_warm_up, name="warm-up", daemon=True).start()
+    try:
+        yield
+    finally:
+        artifact_store.stop()
+        scheduler.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 
 #Cors
 
@@ -53,54 +100,393 @@ def root():
 
 MAX_BYTES = 10 * 1024 * 1024  # 10 MB
 
+
+def run_warm_up():
+    tempos = warm_up(odt_generator)
+    print(f"🔥 Warm-up concluído (ms por etapa): {tempos}")
+
+
+def check_preflight(pdf_path: str):
+    """Inspeciona o PDF e levanta HTTPException para arquivos que nem devem ser processados."""
+    try:
+        pre = inspect_pdf(pdf_path)
+    except PreflightError as e:
+        raise HTTPException(422, str(e))
+    if pre.pages > MAX_PAGES:
+        raise HTTPException(413, f"PDF com {pre.pages} páginas (limite {MAX_PAGES})")
+    return pre
+
+
+def is_scan_heavy(pre) -> bool:
+    return pre.image_pages >= SCAN_HEAVY_PAGES or pre.scan_ratio >= SCAN_HEAVY_RATIO
+
+
+def process_document(pdf_path: str, doc_id: str, on_field=None, fields=None, profile=False) -> dict:
+    """
+    Roda no pool: extrai os campos (todos ou só `fields`) e, se DOC_STATE_TTL_S, guarda
+    uma cópia do PDF e o estado da extração para POST /extract/{doc_id}/field/{name}.
+    Com `profile`, a extração é perfilada e out["profile"] traz o nome do relatório.
+    """
+    from .processing import process_pdf
+    with profiled(artifact_store, f"process_pdf {doc_id}", profile) as prof:
+        out = process_pdf(pdf_path, keep_state=bool(DOC_STATE_TTL_S), on_field=on_field, fields=fields)
+    if prof:
+        out["profile"] = prof.name
+    # distribuição de custo: quantos campos cada tier resolveu (entre todos os workers)
+    for info in out["fields"].values():
+        shared_state.incr(f"tier.{info['tier']}" if info["status"] == "ok" else f"tier.{info['status']}")
+    if out["budget"]["exceeded"]:
+        shared_state.incr(f"budget.{out['budget']['exceeded']}")
+    if DOC_STATE_TTL_S:
+        name = f"doc_{doc_id}.pdf"
+        if not artifact_store.exists(name):
+            # hard link da cópia do intake (mesmo diretório): o PDF não é gravado de novo
+            try:
+                os.link(pdf_path, artifact_store.path(name))
+            except FileExistsError:
+                pass
+            except OSError:
+                with artifact_store.temp_file(suffix=".pdf") as tmp_path:
+                    shutil.copyfile(pdf_path, tmp_path)
+                    os.replace(tmp_path, artifact_store.path(name))
+        artifact_store.touch(name)
+        artifact_store.commit(name)
+        shared_state.set(f"doc:{doc_id}", out.pop("state"), ttl_s=DOC_STATE_TTL_S)
+    return out
+
+
+def submit_pdf(intake, pre, on_field=None, fields=None, profile=False):
+    """Agenda process_document no pool; a cópia do intake só é apagada quando o job termina."""
+    fila = queue_for(pre)
+    try:
+        fut = scheduler.submit(process_document, intake.path, intake.sha256, on_field, fields, profile,
+                               cost_s=pre.eta_s, heavy=(fila == "ocr"))
+    except BaseException:
+        intake.close()
+        raise
+    # mesmo que o cliente desista, o arquivo do intake fica até o worker terminar
+    fut.add_done_callback(lambda _: intake.close())
+    return fut, fila
+
+
+def profile_info(out: dict, token: str = None) -> dict:
+    """
+    Chave "profile" (nome do relatório em /profiles/{name}) quando o job foi perfilado
+    e o request veio com o token de admin; perfis da amostragem ficam só no store.
+    """
+    return {"profile": out["profile"]} if "profile" in out and is_admin(token) else {}
+
+
+def parse_fields(fields: str = None):
+    """?fields=numero_processo,nome_falecido -> lista na ordem do pipeline (None = todos)."""
+    if not fields:
+        return None
+    from .processing import selecionar_campos, CAMPOS_ORDEM
+    try:
+        campos = selecionar_campos(f.strip() for f in fields.split(",") if f.strip())
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+    return None if len(campos) == len(CAMPOS_ORDEM) else campos
+
+
+def cached_result(intake, fields=None):
+    """
+    Resultado em cache no mesmo formato do process_pdf ("resultado", "fields", "budget"),
+    ou None. O cache só guarda resultados completos; um subconjunto sai recortado dele.
+    "budget" é o gasto deste request (nenhum) e "tiers" fica vazio.
+    """
+    if not RESULT_CACHE_TTL_S:
+        return None
+    cache = shared_state.get(f"extracao:{intake.sha256}")
+    if cache is None:
+        return None
+    if DOC_STATE_TTL_S:
+        # o doc_id devolvido tem que servir para /extract: sem estado (ou PDF), reprocessa;
+        # com estado, o acerto no cache renova os dois
+        pdf_name = f"doc_{intake.sha256}.pdf"
+        if not artifact_store.exists(pdf_name) or not shared_state.touch(f"doc:{intake.sha256}", DOC_STATE_TTL_S):
+            return None
+        artifact_store.touch(pdf_name)
+    campos = fields or list(cache["resultado"])
+    return {"resultado": {c: cache["resultado"][c] for c in campos},
+            "fields": {c: cache["fields"][c] for c in campos},
+            "budget": {**Budget().as_dict(), "tiers": {}}}
+
+
+def cache_result(intake, out: dict, fields=None):
+    # resultado parcial (orçamento esgotado ou subconjunto de campos) não vai para o cache
+    if RESULT_CACHE_TTL_S and not out["budget"]["exceeded"] and not fields:
+        shared_state.set(f"extracao:{intake.sha256}", {"resultado": out["resultado"], "fields": out["fields"]},
+                         ttl_s=RESULT_CACHE_TTL_S)
+
+
+def queue_for(pre) -> str:
+    return "ocr" if is_scan_heavy(pre) else "fast"
+
+
+def open_checked(file: UploadFile):
+    """open_intake + preflight; fecha o intake se o arquivo for recusado."""
+    try:
+        intake = open_intake(file.file, MAX_BYTES, store=artifact_store)
+    except IntakeTooLarge:
+        raise HTTPException(413, "Arquivo muito grande")
+    try:
+        return intake, check_preflight(intake.path)
+    except BaseException:
+        intake.close()
+        raise
+
+
+@app.post("/preflight")
+async def preflight(file: UploadFile = File(...)):
+    """
+    Só a inspeção rápida: páginas, criptografia, páginas escaneadas e ETA
+    """
+    intake, pre = open_checked(file)
+    intake.close()
+    return {**pre.as_dict(), "queue": queue_for(pre)}
+
 @app.post("/upload")
-async def upload(file: UploadFile = File(...)):
+async def upload(file: UploadFile = File(...), fields: str = None,
+                 x_profile_token: str = Header(None)):
     """
-    Processa o PDF e retorna APENAS os dados para preencher o formulário frontend
+    Processa o PDF e retorna APENAS os dados para preencher o formulário frontend.
+    ?fields=a,b restringe a extração a esses campos (e ao OCR que eles precisam).
     """
+    fields = parse_fields(fields)
     try:
-        # Salva o arquivo temporariamente
-        written = 0 
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-            # content = await file.read()
-            await file.seek(0)
-            while True:
-                chunk = await file.read(1024 * 1024)  # 1 MB
-                if not chunk:
-                    break
-                written += len(chunk)
-                if written > MAX_BYTES:
-                    raise HTTPException(413, "Arquivo muito grande")
-                tmp_file.write(chunk)
-            tmp_path = tmp_file.name
-
-        
+        # Uma cópia do upload no store (caminho real, serve também aos subprocessos); tamanho e hash saem daqui.
+        # Inspeção rápida: recusa cedo e escolhe a fila
+        intake, pre = open_checked(file)
+
+        # Mesmo PDF já processado (por qualquer worker): devolve direto
+        # (mesmas chaves do fluxo normal; "queue" é a fila que o preflight escolheria)
+        out = cached_result(intake, fields)
+        if out is not None:
+            intake.close()
+            return JSONResponse({
+                "success": True,
+                "data": out["resultado"],
+                "fields": out["fields"],
+                "budget": out["budget"],
+                "doc_id": intake.sha256,
+                "preflight": {**pre.as_dict(), "queue": queue_for(pre)},
+                "cached": True,
+            })
+
+        fut, fila = submit_pdf(intake, pre, fields=fields, profile=should_profile(x_profile_token))
+        print(f"📋 Preflight: {pre.as_dict()} -> fila {fila}")
+
         # Processa o PDF e extrai os dados
-        out = process_pdf(tmp_path)
-        
-        # Limpa arquivo temporário
-        os.unlink(tmp_path)
-        
+        out = await asyncio.wrap_future(fut)
+        cache_result(intake, out, fields)
+
         # Retorna APENAS os campos que o frontend precisa
         return JSONResponse({
             "success": True,
-            "data": out["resultado"]
+            "data": out["resultado"],
+            "fields": out["fields"],
+            "budget": out["budget"],
+            "doc_id": intake.sha256,
+            "preflight": {**pre.as_dict(), "queue": fila},
+            "cached": False,
+            **profile_info(out, x_profile_token),
         })
-        
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro no   processamento: {str(e)}")
     
 
-odt_generator = ODTGenerator()
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/upload/stream")
+async def upload_stream(file: UploadFile = File(...), fields: str = None,
+                        x_profile_token: str = Header(None)):
+    """
+    Igual ao /upload, mas em Server-Sent Events: `preflight`, um `field` por campo
+    assim que ele é encontrado (ou melhorado por um tier seguinte; status "ok" = final)
+    e, no fim, `complete` com o resultado inteiro (ou `error`). Aceita ?fields= como o /upload.
+    """
+    fields = parse_fields(fields)
+    intake, pre = open_checked(file)
+    sse_headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+    cache = cached_result(intake, fields)
+    if cache is not None:
+        intake.close()
+
+        async def do_cache():
+            yield sse("preflight", {**pre.as_dict(), "queue": queue_for(pre)})
+            for campo, valor in cache["resultado"].items():
+                if valor not in (None, []):     # como no fluxo normal: vazios só no `complete`
+                    yield sse("field", {"field": campo, "value": valor, **cache["fields"][campo],
+                                        "cached": True})
+            yield sse("complete", {"success": True, "data": cache["resultado"], "fields": cache["fields"],
+                                   "budget": cache["budget"], "doc_id": intake.sha256, "cached": True})
+
+        return StreamingResponse(do_cache(), media_type="text/event-stream", headers=sse_headers)
+
+    # o worker publica na fila do event loop; None marca o fim do job
+    loop = asyncio.get_running_loop()
+    eventos: asyncio.Queue = asyncio.Queue()
+
+    def on_field(campo, valor, info):
+        loop.call_soon_threadsafe(eventos.put_nowait, {"field": campo, "value": valor, **info})
+
+    fut, fila = submit_pdf(intake, pre, on_field=on_field, fields=fields,
+                           profile=should_profile(x_profile_token))
+    fut.add_done_callback(lambda _: loop.call_soon_threadsafe(eventos.put_nowait, None))
+    print(f"📋 Preflight: {pre.as_dict()} -> fila {fila} (stream)")
+
+    async def stream():
+        try:
+            yield sse("preflight", {**pre.as_dict(), "queue": fila})
+            while (ev := await eventos.get()) is not None:
+                yield sse("field", ev)
+            try:
+                out = fut.result()
+            except Exception as e:
+                yield sse("error", {"success": False, "error": f"Erro no processamento: {e}"})
+                return
+            cache_result(intake, out, fields)
+            yield sse("complete", {
+                "success": True,
+                "data": out["resultado"],
+                "fields": out["fields"],
+                "budget": out["budget"],
+                "doc_id": intake.sha256,
+                "cached": False,
+                **profile_info(out, x_profile_token),
+            })
+        finally:
+            fut.cancel()      # cliente desconectou antes de começar: sai da fila
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers=sse_headers)
+
+
+@app.post("/upload/batch")
+async def upload_batch(files: List[UploadFile] = File(...), fields: str = None,
+                       x_profile_token: str = Header(None)):
+    """
+    Vários PDFs de uma vez. Todos entram no pool compartilhado (vetoriais antes
+    dos escaneados) e cada resultado sai como uma linha NDJSON assim que fica pronto.
+    ?fields= vale para todos os arquivos do lote.
+    """
+    fields = parse_fields(fields)
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(413, f"No máximo {MAX_BATCH_FILES} arquivos por lote")
+
+    prontos_ja = []     # recusados ou já em cache: saem primeiro
+    jobs = {}
+    for idx, f in enumerate(files):
+        # erro num arquivo vira a linha dele; os outros (e os jobs já na fila) seguem
+        intake = None
+        try:
+            intake, pre = open_checked(f)
+            cache = cached_result(intake, fields)
+            if cache is not None:
+                intake.close()
+                prontos_ja.append({"index": idx, "filename": f.filename, "doc_id": intake.sha256,
+                                   "preflight": {**pre.as_dict(), "queue": queue_for(pre)},
+                                   "success": True, "data": cache["resultado"], "fields": cache["fields"],
+                                   "budget": cache["budget"], "cached": True})
+                continue
+            fut, fila = submit_pdf(intake, pre, fields=fields, profile=should_profile(x_profile_token))
+        except Exception as e:
+            if intake is not None:
+                intake.close()
+            erro = e.detail if isinstance(e, HTTPException) else f"Erro no processamento: {e}"
+            prontos_ja.append({"index": idx, "filename": f.filename, "success": False, "error": erro})
+            continue
+        jobs[asyncio.wrap_future(fut)] = {
+            "index": idx, "filename": f.filename, "doc_id": intake.sha256,
+            "preflight": {**pre.as_dict(), "queue": fila}, "_intake": intake,
+        }
+
+    def linha(obj) -> str:
+        return json.dumps(obj, ensure_ascii=False) + "\n"
+
+    async def stream():
+        for r in prontos_ja:
+            yield linha(r)
+        pendentes = set(jobs)
+        try:
+            while pendentes:
+                prontos, pendentes = await asyncio.wait(pendentes, return_when=asyncio.FIRST_COMPLETED)
+                for fut in prontos:
+                    meta = dict(jobs[fut])
+                    intake = meta.pop("_intake")
+                    try:
+                        out = fut.result()
+                        cache_result(intake, out, fields)
+                        yield linha({**meta, "success": True, "data": out["resultado"],
+                                     "fields": out["fields"], "budget": out["budget"], "cached": False,
+                                     **profile_info(out, x_profile_token)})
+                    except Exception as e:
+                        yield linha({**meta, "success": False, "error": f"Erro no processamento: {e}"})
+        finally:
+            for fut in pendentes:      # cliente desconectou: tira da fila o que não começou
+                fut.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.post("/extract/{doc_id}/field/{name}")
+async def extract_field(doc_id: str, name: str, effort: str = "normal"):
+    """
+    Recalcula um único campo de um documento já enviado, reaproveitando o texto e o
+    OCR guardados. effort=high refaz o OCR necessário com DPI maior.
+    """
+    from .processing import reextract_field, CAMPOS_ORDEM, CAMPOS_TEXTO
+    if name not in CAMPOS_ORDEM:
+        raise HTTPException(404, f"Campo desconhecido: {name}")
+    if effort not in ("normal", "high"):
+        raise HTTPException(422, "effort deve ser 'normal' ou 'high'")
+
+    pdf_name = f"doc_{doc_id}.pdf"
+    state = shared_state.get(f"doc:{doc_id}") if DOC_STATE_TTL_S else None
+    if state is None or not artifact_store.exists(pdf_name):
+        raise HTTPException(404, "Documento expirou ou não existe; envie o PDF novamente")
+
+    heavy = effort == "high" or name not in CAMPOS_TEXTO
+    fut = scheduler.submit(reextract_field, artifact_store.path(pdf_name), state, name, effort,
+                           cost_s=5.0 if heavy else 0.1, heavy=heavy)
+    try:
+        valor, novo_state = await asyncio.wrap_future(fut)
+    except BudgetExceeded as e:
+        shared_state.incr(f"budget.{e.kind}")
+        raise HTTPException(status_code=503, detail=f"Limite de processamento atingido: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro no processamento: {str(e)}")
+
+    # o estado fica com o OCR novo (ex.: DPI alto) para as próximas consultas
+    shared_state.set(f"doc:{doc_id}", novo_state, ttl_s=DOC_STATE_TTL_S)
+    artifact_store.touch(pdf_name)
+    return {"success": True, "doc_id": doc_id, "field": name, "effort": effort, "value": valor}
+
+
+#Fila de processamento (jobs na fila/rodando)
+@app.get("/jobs/stats")
+def jobs_stats():
+    return {**scheduler.stats(), "tiers": shared_state.counters("tier."),
+            "budget": shared_state.counters("budget.")}
+
+
+odt_generator = ODTGenerator(store=artifact_store)
 
 @app.post("/review")
-async def review(data: ReviewData):
+async def review(data: ReviewData, x_profile_token: str = Header(None)):
     try:
         print(f"📥 Recebido review data: {data.dict()}")
 
-        #Gerar o documento ODT aqui usando os dados recebidos
-        outh_path=odt_generator.generate_from_template(data.dict())
-        print(f"✅ Documento gerado com sucesso: {outh_path}")
+        #Gerar o documento ODT aqui usando os dados recebidos (ou reaproveitar um idêntico)
+        with profiled(artifact_store, "generate_from_template", should_profile(x_profile_token)) as prof:
+            outh_path, cached = odt_generator.generate_cached(data.dict())
+        print(f"✅ Documento {'reutilizado' if cached else 'gerado'} com sucesso: {outh_path}")
         #Prepara resposta com URL para download
         response = odt_generator.create_download_response(outh_path)
 
@@ -108,7 +494,9 @@ async def review(data: ReviewData):
             "success":True,
             "message": "Documento gerado com sucesso",
             "download_url": response["download_url"],
-            "filename": response["filename"]
+            "filename": response["filename"],
+            "cached": cached,
+            **({"profile": prof.name} if prof and is_admin(x_profile_token) else {}),
         }
     except Exception as e:
         print(f" Erro ao processar review: {e}")
@@ -119,17 +507,52 @@ async def review(data: ReviewData):
 
 #Endpoint para download do arquivo gerado
 @app.get("/download/{filename}")
-async def download_file(filename: str):
+async def download_file(filename: str, if_none_match: str = Header(None)):
     """
-    Endpoint para download do arquivo ODT gerado
+    Endpoint para download do arquivo ODT gerado.
+    Responde 304 quando o navegador já tem a mesma versão (If-None-Match).
+    Só sentenças: o store também guarda os PDFs enviados (doc_*) e os perfis (profile_*).
     """
-    file_path = f"/tmp/{filename}"
-    
-    if not os.path.exists(file_path):
+    if not (filename.startswith("sentenca_") and filename.endswith(".odt")) or not artifact_store.exists(filename):
         raise HTTPException(status_code=404, detail="Arquivo não encontrado")
-    
+    file_path = artifact_store.path(filename)
+    etag = odt_generator.etag_for(file_path)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if if_none_match:
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        if "*" in tags or etag in tags:
+            return Response(status_code=304, headers=headers)
+
     return FileResponse(
         file_path,
         media_type="application/vnd.oasis.opendocument.text",
-        filename=filename
-    )
\ No newline at end of file
+        filename=filename,
+        headers=headers,
+    )
+
+
+#Perfis gravados por profiling.py (só com X-Profile-Token = PROFILE_TOKEN)
+@app.get("/profiles")
+def list_profiles(x_profile_token: str = Header(None)):
+    if not is_admin(x_profile_token):
+        raise HTTPException(status_code=403, detail="Acesso negado")
+    nomes = [n for n in os.listdir(artifact_store.root) if n.startswith("profile_")]
+    return {"profiles": sorted(nomes, reverse=True)}
+
+
+@app.get("/profiles/{name}")
+def download_profile(name: str, x_profile_token: str = Header(None)):
+    """Relatório em texto (.txt) ou estatísticas do cProfile (.prof, para pstats/snakeviz)."""
+    if not is_admin(x_profile_token):
+        raise HTTPException(status_code=403, detail="Acesso negado")
+    if not name.startswith("profile_") or not artifact_store.exists(name):
+        raise HTTPException(status_code=404, detail="Perfil não encontrado")
+    media_type = "text/plain; charset=utf-8" if name.endswith(".txt") else "application/octet-stream"
+    return FileResponse(artifact_store.path(name), media_type=media_type, filename=name)
+
+
+#Uso do diretório de artefatos (bytes, arquivos, evicções)
+@app.get("/artifacts/stats")
+def artifacts_stats():
+    return artifact_store.stats()
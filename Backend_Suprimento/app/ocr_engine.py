@@ -0,0 +1,227 @@
+import os
+import queue
+import logging
+import threading
+import contextlib
+import typing
+
+from .profiling import external_timer
+
+
+# =========================
+# Config
+# =========================
+# auto: tesserocr se instalado, senão pytesseract | tesserocr | pytesseract
+OCR_BACKEND   = os.getenv("OCR_BACKEND", "auto")
+OCR_LANG      = os.getenv("OCR_LANG", "por")
+OCR_POOL_SIZE = int(os.getenv("OCR_POOL_SIZE", "2"))   # engines residentes por processo
+
+
+class OCRTimeout(RuntimeError):
+    """O OCR de uma imagem passou do `timeout` pedido (em segundos)."""
+
+
+# =====================================
+# pytesseract: um processo `tesseract` por chamada (fallback)
+# =====================================
+class PytesseractEngine:
+    name = "pytesseract"
+
+    def __init__(self, lang: str = OCR_LANG):
+        self.lang = lang
+
+    @contextlib.contextmanager
+    def _timeout_as_ocr_timeout(self):
+        try:
+            yield
+        except RuntimeError as e:
+            # o pytesseract mata o processo e levanta RuntimeError('Tesseract process timeout')
+            if "timeout" in str(e).lower():
+                raise OCRTimeout(str(e)) from e
+            raise
+
+    def image_to_string(self, img, psm: int = 6, timeout: float = 0) -> str:
+        from pytesseract import image_to_string
+        with self._timeout_as_ocr_timeout():
+            return image_to_string(img, lang=self.lang, config=f"--oem 1 --psm {psm}", timeout=timeout) or ""
+
+    def image_to_data(self, img, psm: int = 6, timeout: float = 0) -> list[dict]:
+        from pytesseract import image_to_data, Output
+        with self._timeout_as_ocr_timeout():
+            d = image_to_data(img, lang=self.lang, config=f"--oem 1 --psm {psm}",
+                              output_type=Output.DICT, timeout=timeout)
+        words = []
+        for k in range(len(d["text"])):
+            if d["level"][k] != 5 or not (d["text"][k] or "").strip():
+                continue
+            words.append({
+                "block": d["block_num"][k], "par": d["par_num"][k], "line": d["line_num"][k],
+                "left": d["left"][k], "top": d["top"][k],
+                "width": d["width"][k], "height": d["height"][k],
+                "conf": float(d["conf"][k]), "text": d["text"][k],
+            })
+        return words
+
+    def close(self):
+        pass
+
+
+# =====================================
+# tesserocr: engines da C-API com o modelo LSTM já carregado
+# =====================================
+class TesserocrEngine:
+    """
+    Pool de PyTessBaseAPI residentes. Cada instância carrega o modelo `por` uma
+    única vez e recebe a imagem PIL direto da memória (sem arquivo temporário,
+    sem fork). Uma instância só é usada por uma thread de cada vez.
+    """
+    name = "tesserocr"
+
+    def __init__(self, lang: str = OCR_LANG, size: int = OCR_POOL_SIZE):
+        import tesserocr
+        self._tesserocr = tesserocr
+        self.lang = lang
+        self.size = max(1, size)
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._idle.put(self._new_api())   # falha aqui (ex.: tessdata ausente) -> fallback
+        self._created = 1
+
+    def _new_api(self):
+        return self._tesserocr.PyTessBaseAPI(lang=self.lang, oem=self._tesserocr.OEM.LSTM_ONLY)
+
+    @contextlib.contextmanager
+    def _api(self) -> typing.Iterator[typing.Any]:
+        try:
+            api = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_grow = self._created < self.size
+                if can_grow:
+                    self._created += 1
+            api = self._new_api() if can_grow else self._idle.get()
+        try:
+            yield api
+        finally:
+            api.Clear()
+            self._idle.put(api)
+
+    @staticmethod
+    def _recognize(api, timeout: float):
+        # o deadline é do próprio tesseract (ETEXT_DESC): não há processo para matar
+        if not api.Recognize(timeout=int(timeout * 1000)):
+            if timeout:
+                raise OCRTimeout(f"tesserocr não terminou em {timeout:.1f}s")
+            raise RuntimeError("tesserocr: Recognize falhou")
+
+    def image_to_string(self, img, psm: int = 6, timeout: float = 0) -> str:
+        with self._api() as api:
+            api.SetPageSegMode(psm)
+            api.SetImage(img)
+            self._recognize(api, timeout)
+            return api.GetUTF8Text() or ""
+
+    def image_to_data(self, img, psm: int = 6, timeout: float = 0) -> list[dict]:
+        tess = self._tesserocr
+        RIL = tess.RIL
+        words = []
+        with self._api() as api:
+            api.SetPageSegMode(psm)
+            api.SetImage(img)
+            self._recognize(api, timeout)
+            ri = api.GetIterator()
+            block = par = line = 0
+            for r in tess.iterate_level(ri, RIL.WORD):
+                # numeração no mesmo formato do image_to_data do tesseract
+                if r.IsAtBeginningOf(RIL.BLOCK):
+                    block, par, line = block + 1, 0, 0
+                if r.IsAtBeginningOf(RIL.PARA):
+                    par, line = par + 1, 0
+                if r.IsAtBeginningOf(RIL.TEXTLINE):
+                    line += 1
+                text = r.GetUTF8Text(RIL.WORD)
+                box = r.BoundingBox(RIL.WORD)
+                if not text or not text.strip() or not box:
+                    continue
+                x0, y0, x1, y1 = box
+                words.append({
+                    "block": block, "par": par, "line": line,
+                    "left": x0, "top": y0, "width": x1 - x0, "height": y1 - y0,
+                    "conf": float(r.Confidence(RIL.WORD)), "text": text,
+                })
+        return words
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().End()
+            except queue.Empty:
+                break
+
+
+# =====================================
+# Engine do processo (criada na primeira chamada)
+# =====================================
+_engine = None
+_engine_lock = threading.Lock()
+_fallback = PytesseractEngine()
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = _open_engine(OCR_BACKEND)
+                logging.info("OCR engine: %s", _engine.name)
+    return _engine
+
+
+def _open_engine(name: str):
+    if name == "pytesseract":
+        return PytesseractEngine()
+    if name not in ("auto", "tesserocr"):
+        raise ValueError(f"OCR_BACKEND desconhecido: {name!r}")
+    try:
+        return TesserocrEngine()
+    except Exception as e:
+        if name == "tesserocr":
+            logging.warning("tesserocr indisponível (%s); usando pytesseract", e)
+        return PytesseractEngine()
+
+
+def image_to_string(img, psm: int = 6, timeout: float = 0) -> str:
+    """
+    OCR de uma imagem PIL em memória pela engine configurada; pytesseract se ela falhar.
+    timeout > 0 (segundos) levanta OCRTimeout, sem repetir no fallback.
+    """
+    engine = get_engine()
+    with external_timer("tesseract"):
+        try:
+            return engine.image_to_string(img, psm=psm, timeout=timeout)
+        except OCRTimeout:
+            raise
+        except Exception:
+            if isinstance(engine, PytesseractEngine):
+                raise
+            logging.exception("Falha no %s; repetindo com pytesseract", engine.name)
+            return _fallback.image_to_string(img, psm=psm, timeout=timeout)
+
+
+def image_to_data(img, psm: int = 6, timeout: float = 0) -> list[dict]:
+    """
+    OCR com layout: uma entrada por palavra com block/par/line, caixa em pixels
+    e confiança (mesmos campos do `tesseract ... tsv`).
+    """
+    engine = get_engine()
+    with external_timer("tesseract"):
+        try:
+            return engine.image_to_data(img, psm=psm, timeout=timeout)
+        except OCRTimeout:
+            raise
+        except Exception:
+            if isinstance(engine, PytesseractEngine):
+                raise
+            logging.exception("Falha no %s; repetindo com pytesseract", engine.name)
+            return _fallback.image_to_data(img, psm=psm, timeout=timeout)
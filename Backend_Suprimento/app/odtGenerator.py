@@ -1,30 +1,102 @@
+import io
 import os
-import tempfile
 import re
-from odf.opendocument import load
-from odf.text import P, Span
+import json
+import hashlib
 from typing import Dict, Any
-from odf import teletype
-from odf.text import P, H, ListItem
-from odf.table import TableCell
+from .artifacts import ArtifactStore, safe_filename
+# odfpy é importado só ao gerar (ou no warm-up): o /upload não precisa dele
+
+CAMPOS_SENTENCA = [
+    "numero_processo", "requerente", "parentesco", "nome_falecido",
+    "local_obito", "data", "id_parecer", "id_declaracao", "id_certidoes",
+]
+RENDER_KEY_LEN = 16   # hex do sha256 usado no nome do artefato e no ETag
+RE_RENDER_KEY  = re.compile(rf"_(?P<key>[0-9a-f]{{{RENDER_KEY_LEN}}})\.odt$")
+
 # -------------------------
 # Função para gerar o documento ODT a partir do template e dos dados extraídos
 # -------------------------
 
 class ODTGenerator:
 
-    def __init__(self):
+    def __init__(self, store: ArtifactStore = None):
         self.template_path = "app/templates/sentenca_template.odt"
+        self.store = store or ArtifactStore()
+        self._template: tuple[float, bytes, str] = None   # (mtime, bytes, sha256)
+
+    # ---------- Template em memória ----------
+    def _load_template(self) -> tuple[float, bytes, str]:
+        """Bytes e sha256 do template, relidos do disco só quando o mtime muda."""
+        mtime = os.path.getmtime(self.template_path)
+        if not self._template or self._template[0] != mtime:
+            with open(self.template_path, "rb") as f:
+                data = f.read()
+            self._template = (mtime, data, hashlib.sha256(data).hexdigest())
+        return self._template
+
+    def template_bytes(self) -> bytes:
+        return self._load_template()[1]
+
+    def warm_up(self):
+        """Importa o odfpy e deixa o template em memória (usado no warm-up do app)."""
+        from odf.opendocument import load
+        load(io.BytesIO(self.template_bytes()))
+
+    # ---------- Cache de renderização ----------
+    def template_version(self) -> str:
+        """sha256 do template (recalculado só quando o mtime muda)."""
+        return self._load_template()[2]
+
+    def render_key(self, resultado: Dict[str, Any]) -> str:
+        """
+        Chave de conteúdo: hash dos campos normalizados + versão do template.
+        Mesmos dados revisados -> mesmo documento.
+        """
+        norm = {}
+        for campo in CAMPOS_SENTENCA:
+            v = resultado.get(campo)
+            if isinstance(v, (list, tuple)):
+                norm[campo] = [" ".join(str(x).split()) for x in v]
+            else:
+                norm[campo] = " ".join(str(v or "").split())
+        payload = json.dumps({"campos": norm, "template": self.template_version()},
+                             sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:RENDER_KEY_LEN]
+
+    def generate_cached(self, resultado: Dict[str, Any]) -> tuple[str, bool]:
+        """
+        Gera a sentença só se ainda não existir um artefato com a mesma chave.
+        Retorna (caminho, reutilizado).
+        """
+        numero_processo = resultado.get("numero_processo")
+        if not numero_processo:
+            raise ValueError("numero_processo é obrigatório para gerar nome do arquivo")
+        name = f"sentenca_{safe_filename(numero_processo)}_{self.render_key(resultado)}.odt"
+        if self.store.exists(name):
+            self.store.touch(name)
+            print(f"♻️  Reutilizando documento já gerado: {name}")
+            return self.store.path(name), True
+
+        # grava num temporário e publica com rename atômico (nunca expõe arquivo pela metade)
+        with self.store.temp_file(suffix=".odt") as tmp_path:
+            self.generate_from_template(resultado, output_path=tmp_path)
+            os.replace(tmp_path, self.store.path(name))
+        return self.store.commit(name), False
     
     def generate_from_template(self, resultado: Dict[str, Any], output_path: str = None) -> str:
+        from odf.opendocument import load
+        from odf import teletype
         try:
             print(f"🔍 Dados recebidos para substituição: {resultado}")
             numero_processo = resultado.get("numero_processo")
             if not numero_processo:
                 raise ValueError("numero_processo é obrigatório para gerar nome do arquivo")
             # Defina output_path logo no início
+            artifact_name = None
             if output_path is None:
-                output_path = f"/tmp/sentenca_{numero_processo}.odt"
+                artifact_name = f"sentenca_{safe_filename(numero_processo)}.odt"
+                output_path = self.store.path(artifact_name)
                 print(f"📁 Output path definido como: {output_path}")    
             # Verifique se o template existe
             if not os.path.exists(self.template_path):
@@ -33,8 +105,8 @@ class ODTGenerator:
             
             print(f"📁 Carregando template de: {self.template_path}")
         
-            # Carrega o template
-            doc = load(self.template_path)
+            # Carrega o template (bytes já em memória)
+            doc = load(io.BytesIO(self.template_bytes()))
             print("✅ Template carregado com sucesso")
             
             # Extrai texto para debug
@@ -81,6 +153,8 @@ class ODTGenerator:
                     # Verifica se o arquivo foi criado
             if output_path and os.path.exists(output_path):
                 print(f"✅ Documento salvo com sucesso: {output_path}")
+                if artifact_name:
+                    self.store.commit(artifact_name)
                 return output_path
             else:
                 raise Exception(f"Falha ao salvar documento em: {output_path}")
@@ -94,6 +168,15 @@ class ODTGenerator:
 
 
 
+    @staticmethod
+    def etag_for(file_path: str) -> str:
+        """ETag forte: a chave de conteúdo do nome, ou mtime/tamanho para arquivos avulsos."""
+        m = RE_RENDER_KEY.search(os.path.basename(file_path))
+        if m:
+            return f'"{m.group("key")}"'
+        st = os.stat(file_path)
+        return f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+
     def create_download_response(self, file_path: str, filename: str = None):
         """
         Prepara resposta para download do arquivo
@@ -111,6 +194,7 @@ class ODTGenerator:
         """
         Método híbrido: usa abordagem inteligente para manter formatação
         """
+        from odf.text import P, H, Span
         print("🔧 Usando método híbrido de substituição...")
         
         # Primeiro, tenta substituir nos elementos de texto simples
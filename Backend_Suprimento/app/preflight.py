@@ -0,0 +1,183 @@
+import os
+import time
+import typing
+from dataclasses import dataclass, asdict
+
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdfdocument import PDFDocument, PDFPasswordIncorrect, PDFEncryptionError
+from pdfminer.pdftypes import resolve1, PDFStream
+from pdfminer.psparser import LIT
+
+
+# =========================
+# Config
+# =========================
+PREFLIGHT_MAX_PAGES_SCAN = 500     # acima disso as páginas são amostradas
+SCAN_CONTENT_MAX_BYTES   = 512     # content stream de página escaneada é só "q ... cm /Im0 Do Q"
+FORM_MAX_DEPTH           = 4       # Forms aninhados olhados atrás de imagem/fonte
+ETA_VECTOR_PAGE_S        = float(os.getenv("ETA_VECTOR_PAGE_S", "0.05"))  # extração vetorial por página
+ETA_OCR_PAGE_S           = float(os.getenv("ETA_OCR_PAGE_S", "1.5"))      # OCR de corpo por página escaneada
+ETA_REGION_OCR_PAGE_S    = float(os.getenv("ETA_REGION_OCR_PAGE_S", "0.6"))  # OCR de cabeçalho/rodapé por página
+
+LIT_IMAGE = LIT("Image")
+LIT_FORM  = LIT("Form")
+
+
+class PreflightError(ValueError):
+    """PDF ilegível ou protegido: não vale a pena nem abrir com o pdfplumber."""
+
+
+@dataclass
+class Preflight:
+    pages: int
+    encrypted: bool
+    image_pages: int        # estimativa de páginas só-imagem (escaneadas)
+    sampled: bool
+    elapsed_ms: float
+
+    @property
+    def scan_ratio(self) -> float:
+        return self.image_pages / self.pages if self.pages else 0.0
+
+    @property
+    def eta_s(self) -> float:
+        """Estimativa grosseira do tempo de process_pdf."""
+        return round(self.pages * (ETA_VECTOR_PAGE_S + ETA_REGION_OCR_PAGE_S)
+                     + self.image_pages * ETA_OCR_PAGE_S, 1)
+
+    def as_dict(self) -> dict:
+        d = asdict(self)
+        d["eta_s"] = self.eta_s
+        return d
+
+
+# ---------- Árvore de páginas ----------
+def _iter_page_dicts(node, inherited_res=None, seen=None) -> typing.Iterator[tuple[dict, typing.Any]]:
+    """Percorre /Pages -> /Kids sem tocar nos content streams; devolve (página, Resources herdado)."""
+    seen = seen if seen is not None else set()
+    node = resolve1(node)
+    if not isinstance(node, dict) or id(node) in seen:
+        return
+    seen.add(id(node))
+    res = node.get("Resources", inherited_res)
+    kids = resolve1(node.get("Kids"))
+    if kids is None:
+        yield node, res
+        return
+    for kid in kids:
+        yield from _iter_page_dicts(kid, res, seen)
+
+
+def _content_length(page: dict) -> int:
+    """Soma o /Length declarado dos content streams (sem decodificar nada)."""
+    contents = resolve1(page.get("Contents"))
+    if contents is None:
+        return 0
+    streams = contents if isinstance(contents, list) else [contents]
+    return sum(_stream_length(resolve1(st)) for st in streams)
+
+
+def _stream_length(st) -> int:
+    return int(resolve1(st.get("Length")) or 0) if isinstance(st, PDFStream) else 0
+
+
+def _xobjects(res, depth: int = 0) -> tuple[bool, bool]:
+    """
+    (tem imagem, tem texto) nos XObjects de um /Resources, descendo nos Form XObjects
+    pelo /Resources próprio de cada um. O PJe desenha o texto da página dentro de um
+    Form e carimba só o rodapé no conteúdo da página: o Form não é imagem. Form com
+    /Font e sem imagem é texto; com imagem dentro (scan embrulhado num Form, e há
+    gerador que declara /Font em todo Form), só se o conteúdo for maior que o de um scan.
+    """
+    xobjs = resolve1(res.get("XObject")) or {}
+    if not isinstance(xobjs, dict) or depth > FORM_MAX_DEPTH:
+        return False, False
+    has_image = has_text = False
+    for xo in (resolve1(ref) for ref in xobjs.values()):
+        if not isinstance(xo, PDFStream):
+            continue
+        subtype = xo.get("Subtype")
+        if subtype is LIT_IMAGE:
+            has_image = True
+        elif subtype is LIT_FORM:
+            form_res = resolve1(xo.get("Resources"))
+            if isinstance(form_res, dict):
+                img, text = _xobjects(form_res, depth + 1)
+                if resolve1(form_res.get("Font")) and (not img or _stream_length(xo) > SCAN_CONTENT_MAX_BYTES):
+                    text = True
+                has_image, has_text = has_image or img, has_text or text
+        if has_text:
+            break
+    return has_image, has_text
+
+
+def _is_image_only(page: dict, resources) -> bool:
+    res = resolve1(resources) or {}
+    if not isinstance(res, dict):
+        return False
+    has_image, form_text = _xobjects(res)
+    # texto vetorial desenhado via Form: não é scan
+    if not has_image or form_text:
+        return False
+    # sem fonte -> sem texto vetorial; com fonte declarada, só conta como scan
+    # se o conteúdo da página for mínimo (muitos geradores declaram /Font sem usar)
+    if not resolve1(res.get("Font")):
+        return True
+    return _content_length(page) <= SCAN_CONTENT_MAX_BYTES
+
+
+def _inspect(fp) -> tuple[bool, int, int, bool]:
+    """(criptografado, nº de páginas, páginas só-imagem, amostrado) direto do arquivo aberto."""
+    doc = PDFDocument(PDFParser(fp))
+    encrypted = doc.encryption is not None
+    pages_root = doc.catalog.get("Pages")
+    root = resolve1(pages_root)
+    count = resolve1(root.get("Count")) if isinstance(root, dict) else 0
+    count = int(count) if isinstance(count, (int, float)) and count > 0 else 0
+
+    image_pages = 0
+    scanned = 0
+    sampled = count > PREFLIGHT_MAX_PAGES_SCAN
+    step = max(1, count // PREFLIGHT_MAX_PAGES_SCAN) if sampled else 1
+    for n, (page, res) in enumerate(_iter_page_dicts(pages_root)):
+        if n % step:
+            continue
+        scanned += 1
+        if _is_image_only(page, res):
+            image_pages += 1
+    if not count:
+        count = scanned
+    if sampled and scanned:
+        image_pages = round(image_pages * count / scanned)
+    return encrypted, count, image_pages, sampled
+
+
+# =====================================
+# Inspeção rápida (trailer + xref + árvore de páginas)
+# =====================================
+def inspect_pdf(pdf_path: str) -> Preflight:
+    """
+    Lê só o trailer, a xref e os dicionários de página (nenhum content stream é
+    decodificado ou interpretado). Retorna nº de páginas, criptografia e estimativa de páginas
+    escaneadas em poucos milissegundos.
+    """
+    t0 = time.perf_counter()
+    with open(pdf_path, "rb") as fp:
+        try:
+            encrypted, count, image_pages, sampled = _inspect(fp)
+        except (PDFPasswordIncorrect, PDFEncryptionError):
+            raise PreflightError("PDF protegido por senha")
+        except PreflightError:
+            raise
+        except Exception as e:
+            # o pdfminer resolve objetos sob demanda: PDF quebrado estoura em qualquer ponto
+            # da árvore de páginas (PSSyntaxError, TypeError, AttributeError, RecursionError...)
+            raise PreflightError(f"PDF inválido: {type(e).__name__}: {e}")
+
+    return Preflight(
+        pages=int(count),
+        encrypted=encrypted,
+        image_pages=int(image_pages),
+        sampled=sampled,
+        elapsed_ms=round((time.perf_counter() - t0) * 1000, 2),
+    )
@@ -0,0 +1,119 @@
+import os
+import typing
+
+# numpy/PIL só são importados quando alguma imagem é processada (boot mais rápido)
+if typing.TYPE_CHECKING:
+    import numpy as np
+    from PIL import Image
+
+
+# =========================
+# Config
+# =========================
+# Etapas aplicadas antes do OCR, em ordem fixa (deskew -> trim -> binarize).
+# Ex.: OCR_PREPROCESS="deskew,trim,binarize"; vazio (padrão) desliga.
+OCR_PREPROCESS   = os.getenv("OCR_PREPROCESS", "")
+PREPROCESS_STEPS = ("deskew", "trim", "binarize")
+DESKEW_MAX_DEG   = 5.0     # inclinação máxima procurada
+DESKEW_STEP_DEG  = 0.25
+DESKEW_MIN_DEG   = 0.2     # abaixo disso não vale girar
+DESKEW_SAMPLE    = 4       # reduz a imagem 4x só para estimar o ângulo
+TRIM_PAD_PX      = 12      # respiro mantido em volta do conteúdo
+
+
+def parse_steps(spec: str) -> tuple[str, ...]:
+    pedidas = {s.strip().lower() for s in (spec or "").split(",") if s.strip()}
+    desconhecidas = pedidas - set(PREPROCESS_STEPS)
+    if desconhecidas:
+        raise ValueError(f"Etapas de pré-processamento desconhecidas: {sorted(desconhecidas)}")
+    return tuple(s for s in PREPROCESS_STEPS if s in pedidas)
+
+
+DEFAULT_STEPS = parse_steps(OCR_PREPROCESS)
+
+
+# ---------- Operações vetorizadas ----------
+def otsu_threshold(a: "np.ndarray") -> int:
+    """Limiar de Otsu a partir do histograma (sem loop por nível de cinza)."""
+    import numpy as np
+    hist = np.bincount(a.ravel(), minlength=256).astype(np.float64)
+    total = hist.sum()
+    if not total:
+        return 127
+    niveis = np.arange(256, dtype=np.float64)
+    w0 = np.cumsum(hist)
+    w1 = total - w0
+    soma0 = np.cumsum(hist * niveis)
+    mu0 = np.divide(soma0, w0, out=np.zeros_like(soma0), where=w0 > 0)
+    mu1 = np.divide(soma0[-1] - soma0, w1, out=np.zeros_like(soma0), where=w1 > 0)
+    entre = w0 * w1 * (mu0 - mu1) ** 2
+    return int(np.argmax(entre))
+
+
+def estimate_skew(dark: "np.ndarray") -> float:
+    """
+    Ângulo (graus) que deixa as linhas de texto horizontais: para cada ângulo
+    candidato projeta os pixels escuros nas linhas e escolhe a projeção mais
+    "pontuda" (maior soma dos quadrados do histograma).
+    """
+    import numpy as np
+    small = dark[::DESKEW_SAMPLE, ::DESKEW_SAMPLE]
+    ys, xs = np.nonzero(small)
+    if ys.size < 50:
+        return 0.0
+    angulos = np.arange(-DESKEW_MAX_DEG, DESKEW_MAX_DEG + 1e-9, DESKEW_STEP_DEG)
+    tans = np.tan(np.deg2rad(angulos))
+    melhor, melhor_score = 0.0, -1.0
+    offset = int(np.ceil(small.shape[1] * np.abs(tans).max())) + 1
+    for ang, t in zip(angulos, tans):
+        proj = np.rint(ys + xs * t).astype(np.int64) + offset
+        score = float(np.square(np.bincount(proj).astype(np.float64)).sum())
+        if score > melhor_score:
+            melhor, melhor_score = float(ang), score
+    return melhor
+
+
+def content_bbox(dark: "np.ndarray") -> typing.Optional[tuple[int, int, int, int]]:
+    import numpy as np
+    rows = np.flatnonzero(dark.any(axis=1))
+    cols = np.flatnonzero(dark.any(axis=0))
+    if not rows.size:
+        return None
+    h, w = dark.shape
+    return (max(0, int(cols[0]) - TRIM_PAD_PX), max(0, int(rows[0]) - TRIM_PAD_PX),
+            min(w, int(cols[-1]) + 1 + TRIM_PAD_PX), min(h, int(rows[-1]) + 1 + TRIM_PAD_PX))
+
+
+# =====================================
+# Pré-processamento de uma imagem de página/recorte
+# =====================================
+def preprocess(img: "Image.Image", steps: typing.Sequence[str] = DEFAULT_STEPS) -> tuple["Image.Image", tuple[int, int]]:
+    """
+    Aplica as etapas pedidas numa imagem em tons de cinza.
+    Retorna (imagem, (x0, y0)): o deslocamento do recorte de margens, para que
+    caixas de OCR possam ser devolvidas às coordenadas da imagem original.
+    """
+    if not steps:
+        return img, (0, 0)
+    import numpy as np
+    from PIL import Image
+    a = np.asarray(img.convert("L"))
+    limiar = otsu_threshold(a)
+    x0 = y0 = 0
+
+    if "deskew" in steps:
+        ang = estimate_skew(a <= limiar)
+        if abs(ang) >= DESKEW_MIN_DEG:
+            girada = Image.fromarray(a).rotate(-ang, resample=Image.BILINEAR, fillcolor=255)
+            a = np.asarray(girada)
+
+    if "trim" in steps:
+        bbox = content_bbox(a <= limiar)
+        if bbox:
+            x0, y0, x1, y1 = bbox
+            a = a[y0:y1, x0:x1]
+
+    if "binarize" in steps:
+        a = np.where(a <= limiar, 0, 255).astype(np.uint8)
+
+    return Image.fromarray(np.ascontiguousarray(a)), (x0, y0)
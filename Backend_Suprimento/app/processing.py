@@ -1,15 +1,22 @@
+import os
 import re
+import hashlib
 import typing
 import unicodedata
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
 from dataclasses import dataclass, field
-from PIL import Image
 
 
 import pdfplumber
-from pdf2image import convert_from_path
-from pytesseract import image_to_string
-import logging, traceback
+import logging
 
+from .text_backends import TEXT_BACKEND, PlumberText, open_text_backend
+from .ocr_engine import image_to_data, OCRTimeout
+from .budget import Budget, BudgetExceeded
+from .preprocess import DEFAULT_STEPS as PREPROCESS_STEPS, preprocess
+from .rasterizers import RASTER_BACKEND, open_rasterizer
 
 
 # =========================
@@ -18,9 +25,13 @@ import logging, traceback
 OCR_DPI_BODY    = 220
 OCR_DPI_HEADER  = 220
 OCR_DPI_FOOTER  = 220
+OCR_DPI_HIGH    = 300    # modo "esforço alto" da re-extração de um campo
 HEADER_FRAC     = 0.42   # fração de altura para topo
 FOOTER_FRAC     = 0.22   # fração de altura para rodapé
 SHORT_TEXT_WORDS = 70    # limiar para decidir OCR de página
+OCR_LAYOUT_PSM   = 6     # mesmo psm dos recortes: o texto do corpo sai idêntico
+# Último tier da escalada (0 vetor, 1 OCR de páginas curtas, 2 OCR de cabeçalho/rodapé, 3 DPI alto)
+ESCALATION_MAX_TIER = int(os.getenv("ESCALATION_MAX_TIER", "3"))
 
 
 
@@ -54,114 +65,312 @@ def fix_local_obito_uf(local: typing.Optional[str]) -> typing.Optional[str]:
         uf = "PI"
     return f"{cidade}-{uf}"
 
+# =====================================
+# Layout de OCR de uma página (1 OCR, várias consultas por faixa)
+# =====================================
+@dataclass
+class PageLayout:
+    # linhas em ordem de leitura: (topo, base, texto), topo/base como fração da altura
+    lines: list[tuple[float, float, str]]
+
+    @classmethod
+    def from_words(cls, words: list[dict], height: int) -> "PageLayout":
+        grupos: dict[tuple[int, int, int], list[dict]] = {}
+        for wd in words:
+            grupos.setdefault((wd["block"], wd["par"], wd["line"]), []).append(wd)
+        lines = []
+        for ws in grupos.values():
+            top = min(wd["top"] for wd in ws)
+            bottom = max(wd["top"] + wd["height"] for wd in ws)
+            lines.append((top / height, bottom / height, " ".join(wd["text"] for wd in ws)))
+        return cls(lines)
+
+    def text_in_band(self, y0: float, y1: float) -> str:
+        """Texto das linhas cujo centro vertical cai em [y0, y1] (frações da altura)."""
+        return "\n".join(t for top, bottom, t in self.lines if y0 <= (top + bottom) / 2 <= y1)
+
+
 # =====================================
 # PDF context (abre 1x e faz cache)
 # =====================================
 @dataclass
 class PDFContext:
     pdf_path: str
+    text_backend: str = TEXT_BACKEND
+    raster_backend: str = RASTER_BACKEND    # poppler | pdfium (ver rasterizers.py)
+    preprocess_steps: tuple[str, ...] = PREPROCESS_STEPS   # etapas antes do OCR (vazio = imagem crua)
+    ocr_dpi: typing.Optional[int] = None     # força um DPI único para todo OCR (esforço alto)
+    paginas_dpi_alto: typing.Optional[set[int]] = None   # com ocr_dpi: só as faixas destas páginas sobem (None = todas)
+    state: typing.Optional[dict] = None      # snapshot() de uma extração anterior: pula texto e OCR já feitos
+    ocr_short: bool = True    # OCR das páginas curtas já na abertura (False: só quando a escalada pedir)
+    ocr_bands: bool = True    # False: cabeçalho/rodapé só saem de OCR que já foi feito
+    budget: Budget = field(default_factory=Budget)   # limites de OCR, pixels, tempo e memória
     _pdf: pdfplumber.PDF = field(init=False)
     pages_text: list[str] = field(init=False)
-    _img_cache:dict[int, "Image.Image"] = field(init=False, default_factory=dict)
+    _raster: typing.Any = field(default=None, init=False)    # aberto só na primeira rasterização
     _footer_text_cache: dict[int, str] = field(default_factory=dict, init=False)
-
-    #Abre o PDF com pdfplumber e extrai o texto vetorial de todas as páginas para pages_text.
+    _footer_ids: typing.Optional[dict[int, tuple[str, str]]] = field(default=None, init=False)
+    _layout_cache: dict[tuple[int, int], PageLayout] = field(default_factory=dict, init=False)
+    _ocr_pages: list[int] = field(default_factory=list, init=False)
+    _short_done: bool = field(default=False, init=False)
+    _signals: dict[str, int] = field(default_factory=dict, init=False)        # texto -> bits (ver SINAIS)
+    _folded: dict[str, str] = field(default_factory=dict, init=False)         # texto -> lower_noacc
+    _signals_saved: dict[str, int] = field(default_factory=dict, init=False)  # digest -> bits (do snapshot)
+    _memo: dict[str, typing.Any] = field(default_factory=dict, init=False)   # derivados de pages_text
+    candidatas: dict[str, list[int]] = field(default_factory=dict, init=False)  # detector -> páginas candidatas
+
+    #Abre o PDF com pdfplumber e extrai o texto vetorial de todas as páginas para pages_text
+    #(pelo backend configurado: pdfplumber, pdftotext ou pdfium).
+    #Se algo falhar aqui (ex.: orçamento no OCR das páginas curtas), fecha o que já abriu:
+    #quem chamou não recebe o contexto para fechar.
     def __post_init__(self):
         self.pdf = pdfplumber.open(self.pdf_path)
-        self.pages_text = []
-        for page in self.pdf.pages:
-            txt = page.extract_text() or ""
-            self.pages_text.append(txt)
-
-        # OCR seletivo de páginas "curtas"
-        ocr_candidates = [i for i, t in enumerate(self.pages_text)
-                          if len(normalize_spaces(t).split()) < SHORT_TEXT_WORDS]
-        if ocr_candidates:
-            self._batch_raster_and_ocr(ocr_candidates, OCR_DPI_BODY)
-    
+        try:
+            self._text = open_text_backend(self.text_backend, self.pdf_path, self.pdf)
+            if self.state is not None:
+                self._load_state(self.state)
+                self.state = None
+            else:
+                self._extract_text()
+            if self.ocr_short:
+                self.ocr_short_pages()
+        except BaseException:
+            self.close()
+            raise
+
+    def _extract_text(self):
+        try:
+            self.pages_text = self._text.pages_text()
+        except Exception:
+            if type(self._text) is PlumberText:
+                raise
+            logging.exception("Backend de texto %s falhou; usando pdfplumber", self._text.name)
+            self._text.close()
+            self._text = PlumberText(self.pdf_path, self.pdf)
+            self.pages_text = self._text.pages_text()
+
+    #OCR seletivo de páginas "curtas" (uma vez por contexto)
+    def ocr_short_pages(self):
+        if self._short_done:
+            return
+        self._short_done = True
+        self._ocr_pages = [i for i, t in enumerate(self.pages_text)
+                           if len(normalize_spaces(t).split()) < SHORT_TEXT_WORDS]
+        self._batch_raster_and_ocr(self._ocr_pages, self._dpi(OCR_DPI_BODY))
+
+    # ---------- Estado (re-extração incremental) ----------
+    def snapshot(self) -> dict:
+        """Tudo que já custou caro (texto, OCR de layout, rodapés) em formato JSON."""
+        return {
+            "pages_text": list(self.pages_text),
+            "ocr_pages": list(self._ocr_pages),
+            "short_ocr_done": self._short_done,
+            "footer_text": {str(i): t for i, t in self._footer_text_cache.items()},
+            "layouts": {f"{i}:{dpi}": [list(ln) for ln in lay.lines]
+                        for (i, dpi), lay in self._layout_cache.items()},
+            "signals": {"v": SINAIS_VERSAO,
+                        "bits": {**self._signals_saved,
+                                 **{_digest(t): b for t, b in self._signals.items()}}},
+            "candidatas": {c: list(p) for c, p in self.candidatas.items()},
+        }
+
+    def _load_state(self, st: dict):
+        self.pages_text = list(st["pages_text"])
+        self._ocr_pages = list(st.get("ocr_pages", []))
+        self._short_done = st.get("short_ocr_done", True)
+        self._footer_text_cache = {int(i): t for i, t in st.get("footer_text", {}).items()}
+        for k, lines in st.get("layouts", {}).items():
+            i, dpi = map(int, k.split(":"))
+            self._layout_cache[(i, dpi)] = PageLayout([tuple(ln) for ln in lines])
+        self.candidatas = {c: list(p) for c, p in st.get("candidatas", {}).items()}
+        sig = st.get("signals") or {}
+        if sig.get("v") == SINAIS_VERSAO:       # lista de sinais mudou -> recalcula
+            self._signals_saved = dict(sig.get("bits", {}))
+
+    def full_text(self) -> str:
+        if "full_text" not in self._memo:
+            self._memo["full_text"] = "\n\n".join(self.pages_text)
+        return self._memo["full_text"]
+
+    def _dpi(self, default: int) -> int:
+        return self.ocr_dpi or default
+
+    def _dpi_faixa(self, i: int, default: int) -> int:
+        if self.paginas_dpi_alto is not None and i not in self.paginas_dpi_alto:
+            return default
+        return self._dpi(default)
+
+    #Refaz o OCR das páginas que já tinham ido para OCR (ex.: com DPI maior).
+    def reocr_pages(self, paginas: typing.Optional[set[int]] = None):
+        try:
+            for i in self._ocr_pages:
+                if paginas is not None and i not in paginas:
+                    continue
+                self.pages_text[i] = self.text_in_band(i, 0.0, 1.0) or self.pages_text[i]
+        finally:
+            self._memo.clear()
+
     def close(self):
+        try:
+            if self._raster is not None:    # antes do texto: pode usar o PdfDocument dele
+                self._raster.close()
+        except Exception:
+            pass
+        try:
+            self._text.close()
+        except Exception:
+            pass
         try:
             self.pdf.close()
         except Exception:
             pass
 
     # ---------- Raster/OCR ----------
-    #Chama convert_from_path para várias páginas de uma vez que devolve uma lista de imagens PIL.
+    def _rasterizer(self):
+        if self._raster is None:
+            # com o backend de texto pdfium, renderiza do mesmo PdfDocument
+            self._raster = open_rasterizer(self.raster_backend, self.pdf_path,
+                                           doc=getattr(self._text, "doc", None))
+        return self._raster
+
+    #Rasteriza uma página em tons de cinza cobrando do orçamento
+    #(página gigante desce de DPI; poppler com timeout)
+    def _raster_page(self, i: int, dpi: int):
+        page = self.pdf.pages[i]
+        raster = self._rasterizer()
+        dpi = self.budget.raster_dpi(float(page.width), float(page.height), dpi)
+        try:
+            return raster.render(i, dpi, timeout=self.budget.remaining_s())
+        except BudgetExceeded as e:
+            self.budget.fail(e.kind, raster.name)
+
+    #OCR cobrado do orçamento; o tempo que resta vira timeout do tesseract
+    def _ocr(self, fn, img, psm: int):
+        try:
+            return fn(img, psm=psm, timeout=self.budget.remaining_s() or 0)
+        except OCRTimeout:
+            self.budget.fail("deadline", "tesseract")
+
+    #OCR da página inteira com caixas de linha; reaproveitado pelo corpo, cabeçalho e rodapé.
+    def page_layout(self, i: int, dpi: typing.Optional[int] = None) -> PageLayout:
+        dpi = dpi or self._dpi(OCR_DPI_BODY)
+        key = (i, dpi)
+        if key not in self._layout_cache:
+            self.budget.charge_ocr()
+            img = self._raster_page(i, dpi)
+            if img is None:
+                self._layout_cache[key] = PageLayout([])
+            else:
+                altura = img.size[1]
+                img, (_, y0) = preprocess(img, self.preprocess_steps)
+                words = self._ocr(image_to_data, img, OCR_LAYOUT_PSM)
+                for wd in words:          # volta para as coordenadas da página inteira
+                    wd["top"] += y0
+                self._layout_cache[key] = PageLayout.from_words(words, altura)
+                del img
+        return self._layout_cache[key]
+
+    def text_in_band(self, i: int, y0: float, y1: float, dpi: typing.Optional[int] = None) -> str:
+        return self.page_layout(i, dpi).text_in_band(y0, y1)
+
+    #OCR das páginas curtas pelo layout da página (o mesmo OCR atende cabeçalho/rodapé depois).
     def _batch_raster_and_ocr(self, page_indices: list[int], dpi: int):
         if not page_indices:
             return
-        for i in page_indices:
-            pages = convert_from_path(
-                self.pdf_path,
-                dpi=dpi,
-                first_page=i+1,
-                last_page=i+1,
-                grayscale = True,
-                fmt="jpeg",              # menor memória
-                thread_count=1,
-                use_pdftocairo=True
-            )
-            if not pages:
-                continue
-            img = pages[0].convert("L")  # grayscale
-            if len(normalize_spaces(self.pages_text[i]).split()) < SHORT_TEXT_WORDS:
-                self.pages_text[i] = image_to_string(img, lang="por", config="--oem 1 --psm 6") or self.pages_text[i]
-            del img
-    
-    def _get_page_image(self, i: int, dpi: int):
-        cache = self._img_cache if dpi >= 400 else self._img_cache
-        if i not in cache:
-            pages = convert_from_path(self.pdf_path, dpi=dpi, first_page=i+1, last_page=i+1)
-            if pages:
-                cache[i] = pages[0]
-        return cache.get(i)
-       
-    def ocr_region(self, i: int, frac_top: float, frac_bottom: float, dpi: int, psm: int = 6) -> str:
-        pages = convert_from_path(
-            self.pdf_path,
-            dpi=dpi,
-            first_page=i+1,
-            last_page=i+1,
-            grayscale = True,
-            fmt="jpeg",
-            thread_count=1,
-            use_pdftocairo=True
-    )
-        if not pages:
-            return ""
-        img = pages[0].convert("L")
-        w, h = img.size
-        y0 = int(h * frac_top)
-        y1 = int(h * (1.0 - frac_bottom))
-        crop = img.crop((0, y0, w, y1))
-        txt = image_to_string(crop, lang="por", config=f"--oem 1 --psm {psm}") or ""
-        del crop, img
-        return txt
-    
+        try:
+            for i in page_indices:
+                if len(normalize_spaces(self.pages_text[i]).split()) < SHORT_TEXT_WORDS:
+                    self.pages_text[i] = self.text_in_band(i, 0.0, 1.0, dpi=dpi) or self.pages_text[i]
+        finally:
+            self._memo.clear()       # mesmo parcial (orçamento), o texto das páginas mudou
     
-    #Chamam OCR na região do cabeçalho
+    #Página com pouco texto vetorial (a que vai para OCR). Depois do OCR das curtas o
+    #pages_text delas é o do OCR, então vale a lista guardada.
+    def _pagina_curta(self, i: int) -> bool:
+        if self._short_done:
+            if "curtas" not in self._memo:
+                self._memo["curtas"] = frozenset(self._ocr_pages)
+            return i in self._memo["curtas"]
+        return len(normalize_spaces(self.pages_text[i]).split()) < SHORT_TEXT_WORDS
+
+    #Faixa de uma página. Sem layout de OCR pronto, só faz OCR novo com ocr_bands e se a
+    #página não tem corpo vetorial (o cabeçalho/rodapé dela já está no texto vetorial) ou
+    #foi escolhida para o DPI alto: lista de certidões vazia não vira OCR de todas as páginas.
+    def _band(self, i: int, y0: float, y1: float, dpi: int) -> str:
+        if (i, dpi) not in self._layout_cache:
+            if not self.ocr_bands:
+                return ""
+            if not self._pagina_curta(i) and i not in (self.paginas_dpi_alto or ()):
+                return ""
+        return self.text_in_band(i, y0, y1, dpi=dpi)
+
+    #Texto OCR da região do cabeçalho (faixa do layout da página, sem novo OCR)
     def ocr_header(self, i: int, frac: float = HEADER_FRAC) -> str:
-        return self.ocr_region(i, 0.0, 1.0-frac, dpi=OCR_DPI_HEADER, psm=6)
-    #Chamam OCR na região do rodapé
+        return self._band(i, 0.0, frac, self._dpi_faixa(i, OCR_DPI_HEADER))
+    #Texto OCR da região do rodapé (faixa do layout da página, sem novo OCR)
     def ocr_footer(self, i: int, frac: float = FOOTER_FRAC) -> str:
-        return self.ocr_region(i, 1.0-frac, 0.0, dpi=OCR_DPI_FOOTER, psm=6)
-
-    def footer_text(self, i: int, frac: float = FOOTER_FRAC) -> str:
-        if i in self._footer_text_cache:
-            return self._footer_text_cache[i]
+        return self._band(i, 1.0-frac, 1.0, self._dpi_faixa(i, OCR_DPI_FOOTER))
+
+    # ---------- Índice de sinais por página ----------
+    # Chaveado pelo próprio texto da zona: quando um tier troca o texto (OCR, DPI alto)
+    # a consulta seguinte recalcula sozinha; texto igual nunca passa duas vezes pelas regex.
+    def zone_text(self, i: int, zona: str) -> str:
+        return ZONAS[zona](self, i) or ""
+
+    def folded(self, i: int, zona: str) -> str:
+        """Texto da zona em minúsculas e sem acento (lower_noacc), calculado uma vez."""
+        return self._fold(self.zone_text(i, zona))
+
+    def _fold(self, texto: str) -> str:
+        f = self._folded.get(texto)
+        if f is None:
+            f = self._folded[texto] = lower_noacc(texto)
+        return f
+
+    def signals(self, i: int, zona: str) -> int:
+        """Bitset dos SINAIS presentes na zona da página (testar com BIT[nome] / máscaras)."""
+        texto = self.zone_text(i, zona)
+        bits = self._signals.get(texto)
+        if bits is None:
+            bits = self._signals_saved.get(_digest(texto)) if self._signals_saved else None
+            if bits is None:
+                bits = sinais_do_texto(texto, self._fold(texto))
+            self._signals[texto] = bits
+        return bits
+
+    #Rodapé vetorial de todas as páginas numa passada do backend (uma vez por documento)
+    def _load_footers(self):
+        if len(self._footer_text_cache) >= len(self.pages_text):
+            return
         try:
-            page = self.pdf.pages[i]
-            w, h = page.width, page.height
-            bbox = (0, h*(1-frac), w, h)
-            clip = page.within_bbox(bbox)
-            txt = clip.extract_text(x_tolerance=0.5, y_tolerance=0.5) or ""
-            if not txt.strip():
-                words = clip.extract_words(x_tolerance=0.5, y_tolerance=0.5) or []
-                txt = " ".join(wd["text"] for wd in words)
+            txts = self._text.footer_texts(FOOTER_FRAC)
         except Exception:
-            txt = ""
-        self._footer_text_cache[i] = txt
-        return txt
+            logging.exception("Falha lendo os rodapés vetoriais de %s", self.pdf_path)
+            txts = []
+        for i in range(len(self.pages_text)):
+            self._footer_text_cache.setdefault(i, txts[i] if i < len(txts) else "")
+
+    #Rodapé vetorial da página (faixa fixa de FOOTER_FRAC, a mesma do cache salvo no estado)
+    def footer_text(self, i: int) -> str:
+        if i not in self._footer_text_cache:
+            self._load_footers()
+        return self._footer_text_cache.get(i, "")
+
+    def footer_ids(self) -> dict[int, tuple[str, str]]:
+        """Página -> (num, pag) do carimbo "Num. X - Pág. Y" do PJe no rodapé vetorial."""
+        if self._footer_ids is None:
+            self._load_footers()
+            ids = {}
+            for i, txt in self._footer_text_cache.items():
+                m = ID_PAG_PAT.search(txt or "")
+                if m:
+                    ids[i] = (m.group("num"), m.group("pag"))
+                    continue
+                m = ID_PAG_FUZZY.search(txt or "")
+                if m:
+                    ids[i] = (m.group(1), m.group(2))
+            self._footer_ids = ids
+        return self._footer_ids
 
 
 # ---------------------------------------------------------------------
@@ -242,13 +451,6 @@ RE_PARENTESCO = r"""
 """
 
 # --- NOVO: padrão ancorado em "requerente é (grau) de (NOME)" ---
-RE_GRAU_TERMO = r"""
-    filh[ao]|pai|m[ãa]e|av[óô]|bisav[óô]|tatarav[óô]|net[oa]|bisnet[oa]|
-    irm[ãa]o|ti[oa]|sobrinh[ao]|prim[oa]|sogr[oa]|genr[eo]|nora|cunhad[oa]|
-    padrasto|madrasta|entead[oa]|companheir[ao]|convivent[ea]|
-    c[oô]njuge|espos[ao]|marido|mulher|vi[uú]v[ao]|tutor|tutora|tutelad[oa]
-"""
-
 RE_NOME_UPPER = r"""
 (?P<nome>
   (?:[A-ZÁÉÍÓÚÂÊÔÃÕÇ]{2,}|DA|DE|DO|DAS|DOS|E)
@@ -653,6 +855,34 @@ def extract_id_parecer(text: str) -> typing.Optional[str]:
         return candidatos[-1]["id"]
     return None
 
+# Âncora barata de linha da tabela (id5 data hora): só páginas/linhas com ela passam pelo ROW_RE
+RE_TABELA_ANCORA = re.compile(r"\d{5}\s+\d{2}/\d{2}/\d{4}\s+\d{2}:\d{2}")
+
+def extract_id_parecer_paginas(pages: list[str]) -> typing.Optional[str]:
+    """
+    Mesmo resultado de extract_id_parecer sobre as páginas unidas, sem varrer o documento todo:
+    pula páginas sem a âncora da tabela do PJe e lê as linhas de trás para frente,
+    parando no primeiro parecer/manifestação (que é o último da tabela).
+    """
+    for texto in reversed(pages):
+        if not texto or not RE_TABELA_ANCORA.search(texto):
+            continue
+        lines = texto.splitlines()
+        for j in range(len(lines) - 1, -1, -1):
+            if not RE_TABELA_ANCORA.search(lines[j]):
+                continue
+            m = ROW_RE.match(normalize_spaces(lines[j]))
+            if not m or norm_tipo(m.group("tipo")) not in ("parecer", "manifestação"):
+                continue
+            suf = None
+            # a linha seguinte com só 3 dígitos é o sufixo do ID
+            if j + 1 < len(lines):
+                m2 = SUF_RE.match(normalize_spaces(lines[j + 1]))
+                if m2:
+                    suf = m2.group("suf")
+            return m.group("id5") + (suf or "")
+    return None
+
 #---------------------------------------------------------------------------------------------------------------------------
 # --- Declaração de Óbito: ID (Num. ... - Pág. ...) ---
 
@@ -685,12 +915,6 @@ PALAVRAS_DECL = [
     "Cartório do Registro Civil","Cartorio do Registro Civil"
 ]
 
-def _count_kw(*texts: str) -> int:
-    """Conta quantas palavras da lista aparecem (presença distinta, não repetição)."""
-    s = " ".join((t or "").lower() for t in texts)
-    return sum(1 for p in PALAVRAS_DECL if p.lower() in s)
-
-
 def _extrai_id_pag(texto: str) -> typing.Optional[str]:
     m = ID_PAG_PAT.search(texto or "")
     if m:
@@ -709,21 +933,21 @@ def extract_id_declaracao_avancado(ctx: PDFContext) -> typing.Optional[str]:
 
     # 1) Só entram páginas que tenham 'Declaração de Óbito' no topo (e não sejam CN)
     for i, _ in enumerate(ctx.pages_text):
-        body = ctx.pages_text[i] or ""
-        head = ctx.ocr_header(i, frac=0.42) or ""
+        bits = ctx.signals(i, "body") | ctx.signals(i, "header")
 
         # filtros obrigatórios
-        has_do = RE_DO_HEADER.search(head) or RE_DO_HEADER.search(body)
-        is_cn  = RE_NASC_HEADER.search((head + " " + body).lower()) or RE_RCNP.search((head + " " + body).lower())
+        has_do = bits & BIT["do_titulo"]
+        is_cn  = bits & MASK_CN
 
         # novo: precisa ter > 2 palavras-chave (>= 3)
-        kw_score = _count_kw(body, head)
+        kw_score = (bits & MASK_KW_DECL).bit_count()
 
         # debug opcional
         print(f"[DO] pág {i+1:>2}  has_DO={bool(has_do)}  is_CN={bool(is_cn)}  kw={kw_score}")
 
         if has_do and not is_cn and kw_score >= 2:
             candidatas.append(i)
+    ctx.candidatas["id_declaracao"] = candidatas
 
     # Sem candidatas válidas → nada a retornar
     if not candidatas:
@@ -737,11 +961,11 @@ def extract_id_declaracao_avancado(ctx: PDFContext) -> typing.Optional[str]:
             print(f"[DO] pág {i+1}: ID pelo corpo")
             return idp
 
-        # (b) rodapé via pdfplumber
-        idp = _extrai_id_pag(ctx.footer_text(i))
-        if idp:
+        # (b) rodapé vetorial (índice de todas as páginas)
+        par = ctx.footer_ids().get(i)
+        if par:
             print(f"[DO] pág {i+1}: ID no rodapé (pdf)")
-            return idp
+            return f"Num. {par[0]} - Pág. {par[1]}"
 
         # (c) rodapé via OCR
         idp = _extrai_id_pag(ctx.ocr_footer(i, frac=0.28))
@@ -781,37 +1005,87 @@ RE_EXCL_JUD = re.compile(r"(processo\s*n?[ºo]|classe\s*:|assunto\s*:|requerente
 RE_EXCL_MP = re.compile(r"(minist[eé]rio\s+p[úu]blico|promotori[ao]?\s+de\s+justi[cç]a|"r"promotor[ao]\s+de\s+justi[cç]a|\bparquet\b)",re.IGNORECASE,)
 
 
+# =====================================
+# Índice de sinais por página (compartilhado pelos detectores de tipo de documento)
+# =====================================
+CERT_HEADER_FRAC = 0.55   # o detector de certidão olha um topo maior que o da declaração
+
+# zonas de uma página: corpo (texto vetorial/OCR), cabeçalhos por OCR e rodapé vetorial
+ZONAS: dict[str, typing.Callable[[PDFContext, int], str]] = {
+    "body":        lambda ctx, i: ctx.pages_text[i],
+    "header":      lambda ctx, i: ctx.ocr_header(i, frac=HEADER_FRAC),
+    "header_cert": lambda ctx, i: ctx.ocr_header(i, frac=CERT_HEADER_FRAC),
+    "footer":      lambda ctx, i: ctx.footer_text(i),
+}
+
+# (nome, forma do texto, regex ou substring): cada sinal é um bit.
+# forma: "raw" texto como veio, "lower" minúsculas, "fold" lower_noacc
+SINAIS: list[tuple[str, str, typing.Union[re.Pattern, str]]] = [
+    ("do_titulo",       "raw",   RE_DO_HEADER),
+    ("nascimento",      "lower", RE_NASC_HEADER),
+    ("rcnp",            "lower", RE_RCNP),
+    ("cert_neg_titulo", "fold",  RE_CERT_NEG_TIT),
+    ("cartorio",        "fold",  RE_CARTORIO),
+    ("cartorio_forte",  "fold",  RE_CARTORIO_STRONG),
+    ("excl_nasc",       "fold",  RE_EXCL_NASC),
+    ("excl_jud",        "fold",  RE_EXCL_JUD),
+    ("excl_mp",         "fold",  RE_EXCL_MP),
+    ("id_pag",          "raw",   ID_PAG_PAT),
+] + [(f"kw:{p}", "lower", p.lower()) for p in PALAVRAS_DECL]
+
+BIT = {nome: 1 << k for k, (nome, _, _) in enumerate(SINAIS)}
+SINAIS_VERSAO = hashlib.sha1("|".join(n for n, _, _ in SINAIS).encode("utf-8")).hexdigest()[:8]
+
+MASK_CN      = BIT["nascimento"] | BIT["rcnp"]
+MASK_KW_DECL = sum(BIT[f"kw:{p}"] for p in PALAVRAS_DECL)
+MASK_EXCL    = BIT["excl_nasc"] | BIT["excl_jud"] | BIT["excl_mp"]
+MASK_CART    = BIT["cartorio"] | BIT["cartorio_forte"]
+
+
+def _digest(texto: str) -> str:
+    return hashlib.blake2b(texto.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def sinais_do_texto(texto: str, folded: typing.Optional[str] = None) -> int:
+    if not texto:
+        return 0
+    formas = {"raw": texto, "lower": texto.lower(),
+              "fold": folded if folded is not None else lower_noacc(texto)}
+    bits = 0
+    for k, (_, forma, padrao) in enumerate(SINAIS):
+        t = formas[forma]
+        if (padrao in t) if isinstance(padrao, str) else padrao.search(t):
+            bits |= 1 << k
+    return bits
+
+
+def _is_cert(bits: int) -> bool:
+    return not (bits & MASK_EXCL) and bool(bits & BIT["cert_neg_titulo"]) and bool(bits & MASK_CART)
+
+
 def _explain_page(text: str) -> dict:
     """
-    Avalia todos os sinais na página/trecho e explica o que bateu.
-    Retorna um dicionário com flags e trechos (snippets) de cada match.
+    Depuração do detector de certidão para um texto qualquer (corpo de uma página ou
+    faixa do PageLayout): calcula o bitset de SINAIS, como ctx.signals, sem OCR.
+    Retorna {"is_cert": decisão de _is_cert, "sinais": nomes dos bits que bateram}.
     """
-    t = lower_noacc(text or "")
-    excl = any(rx.search(t) for rx in (RE_EXCL_NASC, RE_EXCL_JUD,RE_EXCL_MP))
-    has_title = bool(RE_CERT_NEG_TIT.search(t))
-    has_cart  = bool(RE_CARTORIO.search(t) or RE_CARTORIO_STRONG.search(t))
-    is_cert   = (not excl) and has_title and has_cart
-    return {"is_cert": is_cert}
+    bits = sinais_do_texto(text or "")
+    return {"is_cert": _is_cert(bits), "sinais": [n for n, b in BIT.items() if bits & b]}
 
 
 
 def find_certidoes_negativas(ctx: PDFContext, debug: bool = False):
     resultados = []
-    for i, full_txt in enumerate(ctx.pages_text):
-        decided = _explain_page(full_txt)["is_cert"]
+    ctx.candidatas["id_certidoes"] = candidatas = []
+    for i in range(len(ctx.pages_text)):
+        decided = _is_cert(ctx.signals(i, "body"))
         if not decided:
-            head_txt = ctx.ocr_header(i, frac=0.55)
-            if head_txt:
-                decided = _explain_page(head_txt)["is_cert"]
+            decided = _is_cert(ctx.signals(i, "header_cert"))
         if not decided:
             continue
-        par = None
-        txt_pdf = ctx.footer_text(i)
-        m = ID_PAG_PAT.search(txt_pdf or "")
-        if m: par = (m.group("num"), m.group("pag")); id_source = "pdf_footer"
-        if not par:
-            m2 = ID_PAG_FUZZY.search(txt_pdf or "")
-            if m2: par = (m2.group(1), m2.group(2)); id_source = "pdf_footer"
+        candidatas.append(i)
+        par = ctx.footer_ids().get(i)
+        if par: id_source = "pdf_footer"
         if not par:
             rod_ocr = ctx.ocr_footer(i, frac=0.28)
             m3 = ID_PAG_PAT.search(rod_ocr or "")
@@ -839,41 +1113,273 @@ CAMPOS_ORDEM = [
     "local_obito","data","id_parecer","id_declaracao","id_certidoes"
 ]
 
+# Extratores por campo: cada um só olha o contexto, então dá para rodar um campo sozinho
+def _parentesco_falecido(ctx: PDFContext) -> tuple[typing.Optional[str], typing.Optional[str]]:
+    if "parentesco_falecido" not in ctx._memo:
+        ctx._memo["parentesco_falecido"] = extract_parentesco_e_falecido(ctx.full_text())
+    return ctx._memo["parentesco_falecido"]
+
+EXTRATORES: dict[str, typing.Callable[[PDFContext], typing.Any]] = {
+    "numero_processo": lambda ctx: extract_numero_processo(ctx.full_text()),
+    "requerente":      lambda ctx: extract_requerente(ctx.full_text()),
+    "parentesco":      lambda ctx: _parentesco_falecido(ctx)[0],
+    "nome_falecido":   lambda ctx: _parentesco_falecido(ctx)[1],
+    "local_obito":     lambda ctx: fix_local_obito_uf(extract_local_obito(ctx.full_text())),
+    "data":            lambda ctx: extract_data_obito(ctx.full_text()),
+    "id_parecer":      lambda ctx: extract_id_parecer_paginas(ctx.pages_text),
+    "id_declaracao":   lambda ctx: extract_id_declaracao_avancado(ctx),
+    "id_certidoes":    lambda ctx: find_certidoes_negativas(ctx, debug=False),
+}
+# campos que saem do texto das páginas (os demais dependem de OCR de cabeçalho/rodapé)
+CAMPOS_TEXTO = CAMPOS_ORDEM[:7]
+
+def selecionar_campos(campos: typing.Optional[typing.Iterable[str]]) -> list[str]:
+    """Normaliza uma seleção de campos (None = todos) na ordem de CAMPOS_ORDEM."""
+    if campos is None:
+        return list(CAMPOS_ORDEM)
+    campos = set(campos)
+    desconhecidos = campos - set(CAMPOS_ORDEM)
+    if desconhecidos:
+        raise ValueError(f"Campo desconhecido: {', '.join(sorted(desconhecidos))}")
+    return [c for c in CAMPOS_ORDEM if c in campos]
+
 def montar_resultado(ctx: PDFContext) -> dict:
-    full_text = "\n\n".join(ctx.pages_text)
-
-    par, fal = extract_parentesco_e_falecido(full_text)
-
-    req_raw = extract_requerente(full_text)
-    loc_raw = extract_local_obito(full_text)
-   
-
-    resultado = {
-        "numero_processo": extract_numero_processo(full_text),
-        "requerente":      req_raw,
-        "parentesco":      par,
-        "nome_falecido":   fal,
-        "local_obito":     fix_local_obito_uf(loc_raw),
-        "data":            extract_data_obito(full_text),
-        "id_parecer":      extract_id_parecer(full_text),
-        "id_declaracao":   extract_id_declaracao_avancado(ctx),
-        "id_certidoes":    find_certidoes_negativas(ctx, debug=False),
-    }
+    resultado = {campo: EXTRATORES[campo](ctx) for campo in CAMPOS_ORDEM}
     print("Resultado extraído:", resultado)
     return resultado
 
+
+# -------------------------
+# Confiança de um valor extraído: "ok", "low" (achou algo implausível) ou "missing"
+# -------------------------
+RE_DATA_BR   = re.compile(r"^\d{2}/\d{2}/\d{4}$")
+RE_LOCAL_UF  = re.compile(r"^\D{2,}-[A-Z]{2}$")
+RE_ID_PARECER = re.compile(r"^\d{5,8}$")
+RE_ID_PAG    = re.compile(r"^Num\. \d{6,} - Pág\. \d+$")
+
+def cnj_valido(numero: str) -> bool:
+    """Dígito verificador do número CNJ (NNNNNNN-DD.AAAA.J.TR.OOOO, módulo 97)."""
+    m = re.fullmatch(r"(\d{7})-(\d{2})\.(\d{4})\.(\d)\.(\d{2})\.(\d{4})", numero or "")
+    if not m:
+        return False
+    n, dv, ano, j, tr, orig = m.groups()
+    return 98 - int(n + ano + j + tr + orig + "00") % 97 == int(dv)
+
+def _data_plausivel(s: str) -> bool:
+    if not RE_DATA_BR.match(s):
+        return False
+    try:
+        d = datetime.strptime(s, "%d/%m/%Y").date()
+    except ValueError:
+        return False
+    return date(1900, 1, 1) <= d <= date.today()
+
+def _nome_plausivel(s: str) -> bool:
+    return len(s.split()) >= 2 and not re.search(r"\d", s) and len(s) <= 120
+
+VALIDADORES: dict[str, typing.Callable[[typing.Any], bool]] = {
+    "numero_processo": cnj_valido,
+    "requerente":      _nome_plausivel,
+    "parentesco":      lambda v: bool(v.strip()),
+    "nome_falecido":   _nome_plausivel,
+    "local_obito":     lambda v: bool(RE_LOCAL_UF.match(v)),
+    "data":            _data_plausivel,
+    "id_parecer":      lambda v: bool(RE_ID_PARECER.match(v)),
+    "id_declaracao":   lambda v: bool(RE_ID_PAG.match(v)),
+    "id_certidoes":    lambda v: all(RE_ID_PAG.match(c["rodape"]) for c in v),
+}
+_RANK_STATUS = {"missing": 0, "low": 1, "ok": 2}
+
+VAZIO = {"id_certidoes": []}   # valor de um campo que nem chegou a ser avaliado
+
+def confianca(campo: str, valor: typing.Any) -> str:
+    if not valor:
+        return "missing"
+    return "ok" if VALIDADORES[campo](valor) else "low"
+
+
+# -------------------------
+# Escalada por tiers: cada tier só roda para os campos ainda ausentes/duvidosos
+# -------------------------
+TIERS = ("vetor", "ocr_paginas", "ocr_faixas", "ocr_dpi_alto")
+
+def _tier_serve(ctx: PDFContext, tier: int, campo: str) -> bool:
+    """
+    As faixas de OCR (tier 2) só mudam o que os detectores de cabeçalho/rodapé veem.
+    Um detector só vai ao DPI alto (tier 3) se já achou páginas candidatas: sem
+    candidata (ex.: processo sem certidão negativa) o OCR a 300 dpi de todas as
+    páginas não acharia nada a mais e estouraria o orçamento.
+    """
+    if campo in CAMPOS_TEXTO:
+        return tier != 2
+    return tier != 3 or bool(ctx.candidatas.get(campo))
+
+@contextmanager
+def _medindo(ctx: PDFContext, custo: dict):
+    """Soma em `custo` o tempo, as páginas de OCR e os megapixels gastos no bloco."""
+    t0, ocr0, mpix0 = time.perf_counter(), ctx.budget.ocr_pages, ctx.budget.raster_mpix
+    try:
+        yield
+    finally:
+        custo["ms"] = round(custo.get("ms", 0) + (time.perf_counter() - t0) * 1000, 1)
+        custo["ocr_pages"] = custo.get("ocr_pages", 0) + ctx.budget.ocr_pages - ocr0
+        custo["raster_mpix"] = round(custo.get("raster_mpix", 0) + ctx.budget.raster_mpix - mpix0, 1)
+
+def _subir_tier(ctx: PDFContext, tier: int, alvo: list[str]):
+    if tier == 1:
+        ctx.ocr_short_pages()
+    elif tier == 2:
+        ctx.ocr_bands = True
+    elif tier == 3:
+        _subir_dpi(ctx, alvo)
+
+def _subir_dpi(ctx: PDFContext, alvo: typing.Iterable[str]):
+    """
+    Faixas a 300 dpi só nas candidatas dos detectores; páginas curtas todas se
+    algum campo de texto ainda precisa, senão também só as candidatas.
+    """
+    alvo = list(alvo)
+    paginas = {i for c in alvo if c not in CAMPOS_TEXTO for i in ctx.candidatas.get(c, ())}
+    ctx.ocr_dpi = OCR_DPI_HIGH
+    ctx.paginas_dpi_alto = paginas
+    ctx.reocr_pages(None if any(c in CAMPOS_TEXTO for c in alvo) else paginas)
+
+# on_field(campo, valor, {"tier", "status"}): chamado a cada valor novo/melhor de um campo
+OnField = typing.Callable[[str, typing.Any, dict], None]
+
+def montar_resultado_escalonado(ctx: PDFContext, max_tier: int = ESCALATION_MAX_TIER,
+                                on_field: typing.Optional[OnField] = None,
+                                campos: typing.Optional[typing.Iterable[str]] = None,
+                                ) -> tuple[dict, dict, dict]:
+    """
+    Roda os extratores tier a tier (ver TIERS). Um valor só é trocado por outro de
+    confiança maior. Devolve (resultado, {campo: {"tier", "status", "cost"}}, custo
+    de cada tier), onde tier é o tier que deu o valor final (None se nenhum achou o
+    campo). Se o orçamento do contexto acabar, devolve o parcial: campos não
+    avaliados saem como "skipped" e os que ainda não estavam "ok" ganham "budget"
+    com o limite que estourou.
+    `on_field` recebe cada valor assim que ele aparece ou melhora (status "ok" = final).
+    `campos` restringe a extração (None = CAMPOS_ORDEM): um tier só sobe se servir a
+    algum campo pendente, então pedir só campos de texto nunca faz OCR de faixas.
+    "cost" de um campo é o que os extratores dele gastaram; o OCR de subir um tier é
+    compartilhado e sai no custo do tier.
+    """
+    campos = selecionar_campos(campos)
+    resultado: dict = {}
+    info: dict[str, dict] = {}
+    custo: dict[str, dict] = {c: {} for c in campos}
+    custo_tiers: dict[str, dict] = {}
+    pendentes = list(campos)
+
+    def avaliar(campo: str, tier: int):
+        with _medindo(ctx, custo[campo]):
+            valor = EXTRATORES[campo](ctx)
+        status = confianca(campo, valor)
+        if campo not in info or _RANK_STATUS[status] > _RANK_STATUS[info[campo]["status"]]:
+            resultado[campo] = valor
+            info[campo] = {"tier": tier, "status": status}
+            if on_field and status != "missing":
+                try:
+                    on_field(campo, valor, dict(info[campo]))
+                except Exception:
+                    logging.exception("Erro no callback on_field (%s)", campo)
+
+    tier = 0
+    try:
+        for tier in range(max_tier + 1):
+            alvo = [c for c in pendentes if _tier_serve(ctx, tier, c)]
+            if not alvo:
+                continue
+            if tier:
+                with _medindo(ctx, custo_tiers.setdefault(TIERS[tier], {})):
+                    _subir_tier(ctx, tier, alvo)
+            for campo in alvo:
+                ctx.budget.check()
+                avaliar(campo, tier)
+            pendentes = [c for c in pendentes if info[c]["status"] != "ok"]
+            if not pendentes:
+                break
+    except (BudgetExceeded, MemoryError) as e:
+        # orçamento esgotado (ou RLIMIT_AS do worker): fica o melhor de cada campo até aqui
+        kind = getattr(e, "kind", "rss")
+        ctx.budget.exceeded = ctx.budget.exceeded or kind
+        logging.warning("Orçamento esgotado (%s) em %s; resultado parcial", kind, ctx.pdf_path)
+        if kind != "rss":
+            # última passada sem OCR novo (o orçamento recusa): aproveita o texto já lido no tier
+            for campo in pendentes:
+                try:
+                    avaliar(campo, tier)
+                except BudgetExceeded:
+                    pass
+        for campo in campos:
+            if campo not in info:
+                resultado[campo] = VAZIO.get(campo)
+                info[campo] = {"tier": None, "status": "skipped"}
+            if info[campo]["status"] != "ok":
+                info[campo]["budget"] = kind
+    for campo, i in info.items():
+        if i["status"] == "missing":       # nenhum tier achou: não há tier a creditar
+            i["tier"] = None
+        i["cost"] = custo[campo]
+    resultado = {c: resultado[c] for c in campos}
+    print("Resultado extraído:", resultado)
+    print("Tiers:", {c: (i["tier"], i["status"]) for c, i in info.items()})
+    return resultado, {c: info[c] for c in campos}, custo_tiers
+
 #---------------------------------------------------------------------------------------------------------------------------
 
 
 # -------------------------
 # Cria um PDFContext e no finally fecha o PDF
 # -------------------------
-def process_pdf(pdf_path: str) -> dict:
-    ctx = PDFContext(pdf_path)
+def process_pdf(pdf_path: str, keep_state: bool = False, budget: typing.Optional[Budget] = None,
+                on_field: typing.Optional[OnField] = None,
+                fields: typing.Optional[typing.Iterable[str]] = None) -> dict:
+    fields = selecionar_campos(fields)      # campo desconhecido falha antes de abrir o PDF
+    ctx = PDFContext(pdf_path, ocr_short=False, ocr_bands=False,   # a escalada decide o OCR
+                     budget=budget or Budget())
     try:
-        return {"resultado": montar_resultado(ctx)}
+        resultado, campos, custo_tiers = montar_resultado_escalonado(ctx, on_field=on_field,
+                                                                     campos=fields)
+        out = {"resultado": resultado, "fields": campos,
+               "budget": {**ctx.budget.as_dict(), "tiers": custo_tiers}}
+        if keep_state:
+            out["state"] = ctx.snapshot()
+        return out
     except Exception:
         logging.exception("Erro processando %s", pdf_path)  # imprime stack trace
         raise
     finally:
-        ctx.close()
\ No newline at end of file
+        ctx.close()
+
+
+# -------------------------
+# Recalcula um único campo a partir do estado salvo de uma extração anterior
+# -------------------------
+def reextract_field(pdf_path: str, state: dict, campo: str, effort: str = "normal") -> tuple[typing.Any, dict]:
+    """
+    Recalcula só `campo` a partir do estado salvo por process_pdf(keep_state=True).
+    Devolve (valor, estado atualizado). effort="high" refaz o OCR com DPI maior: campo
+    de texto nas páginas que foram para OCR, detector só nas páginas candidatas dele
+    (as do estado; sem elas, uma passada no DPI normal as encontra), como no tier 3.
+    """
+    if campo not in EXTRATORES:
+        raise ValueError(f"Campo desconhecido: {campo!r}")
+    high = effort == "high"
+    texto = campo in CAMPOS_TEXTO
+    ctx = None
+    try:
+        ctx = PDFContext(pdf_path, state=state, ocr_dpi=OCR_DPI_HIGH if high and texto else None)
+        if high and texto:
+            ctx.reocr_pages()
+        elif high:
+            if campo not in ctx.candidatas:
+                EXTRATORES[campo](ctx)
+            _subir_dpi(ctx, [campo])
+        return EXTRATORES[campo](ctx), ctx.snapshot()
+    except Exception:
+        logging.exception("Erro re-extraindo %s de %s", campo, pdf_path)
+        raise
+    finally:
+        if ctx is not None:
+            ctx.close()
@@ -0,0 +1,128 @@
+import io
+import os
+import hmac
+import time
+import random
+import secrets
+import logging
+import threading
+import contextlib
+import typing
+
+
+# =========================
+# Config
+# =========================
+PROFILE_TOKEN       = os.getenv("PROFILE_TOKEN", "")                  # X-Profile-Token; vazio = sem perfil sob demanda
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))    # fração de requests perfilados (0 = nenhum)
+PROFILE_TOP_N       = int(os.getenv("PROFILE_TOP_N", "40"))           # linhas do relatório em texto
+
+_local = threading.local()     # perfil ativo da thread (o job roda inteiro na thread do worker)
+
+
+def is_admin(token: typing.Optional[str]) -> bool:
+    # em bytes: com str o compare_digest levanta TypeError para header com caractere não-ASCII
+    return bool(PROFILE_TOKEN and token) and hmac.compare_digest(
+        token.encode("utf-8", "surrogateescape"), PROFILE_TOKEN.encode("utf-8", "surrogateescape"))
+
+
+def should_profile(token: typing.Optional[str] = None) -> bool:
+    """Perfila se veio o header de admin certo ou se o request caiu na amostragem."""
+    if is_admin(token):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+@contextlib.contextmanager
+def external_timer(kind: str):
+    """
+    Soma o tempo de uma chamada externa (poppler, tesseract) no perfil ativo da
+    thread. Sem perfil ativo custa só um getattr.
+    """
+    prof = getattr(_local, "profile", None)
+    if prof is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        prof.add_external(kind, time.perf_counter() - t0)
+
+
+class Profile:
+    """Um request perfilado: cProfile da thread + tempo gasto em poppler/tesseract."""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.name = f"profile_{time.strftime('%Y%m%d-%H%M%S')}_{secrets.token_hex(4)}"
+        self.external: dict[str, list] = {}     # kind -> [chamadas, segundos]
+        self.wall_s = 0.0
+        self.cprofile = None
+
+    def add_external(self, kind: str, seconds: float):
+        tot = self.external.setdefault(kind, [0, 0.0])
+        tot[0] += 1
+        tot[1] += seconds
+
+    def report(self) -> str:
+        linhas = [f"{self.label}", f"wall: {self.wall_s * 1000:.0f} ms", ""]
+        for kind, (n, s) in sorted(self.external.items()):
+            linhas.append(f"{kind:<10} {n:>5} chamadas {s * 1000:>9.0f} ms ({s / max(self.wall_s, 1e-9):.0%})")
+        if self.cprofile is None:
+            linhas += ["", "cProfile indisponível (outro profiler ativo)"]
+            return "\n".join(linhas) + "\n"
+        import pstats
+        for ordem in ("cumulative", "tottime"):
+            buf = io.StringIO()
+            pstats.Stats(self.cprofile, stream=buf).strip_dirs().sort_stats(ordem).print_stats(PROFILE_TOP_N)
+            linhas += ["", f"== por {ordem}", buf.getvalue()]
+        return "\n".join(linhas)
+
+    def save(self, store) -> None:
+        """Grava <name>.txt (relatório) e, com cProfile, <name>.prof (pstats/snakeviz)."""
+        with store.temp_file(suffix=".txt") as tmp:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(self.report())
+            os.replace(tmp, store.path(f"{self.name}.txt"))
+        store.commit(f"{self.name}.txt")
+        if self.cprofile is not None:
+            with store.temp_file(suffix=".prof") as tmp:
+                self.cprofile.dump_stats(tmp)
+                os.replace(tmp, store.path(f"{self.name}.prof"))
+            store.commit(f"{self.name}.prof")
+
+
+@contextlib.contextmanager
+def profiled(store, label: str, enabled: bool) -> typing.Iterator[typing.Optional[Profile]]:
+    """
+    Perfila o bloco quando `enabled` e salva o resultado no artifact store.
+    Devolve o Profile (use .name para montar o download) ou None se desligado.
+    No Python 3.12+ o cProfile vale para o processo todo: jobs simultâneos aparecem
+    no mesmo perfil e um segundo perfil simultâneo fica só com o tempo externo.
+    """
+    if not enabled:
+        yield None
+        return
+    import cProfile
+    prof = Profile(label)
+    cp = cProfile.Profile()
+    try:
+        cp.enable()
+        prof.cprofile = cp
+    except ValueError:          # já há um profiler ativo no processo: fica só o tempo externo
+        pass
+    _local.profile = prof
+    t0 = time.perf_counter()
+    try:
+        yield prof
+    finally:
+        if prof.cprofile is not None:
+            cp.disable()
+        _local.profile = None
+        prof.wall_s = time.perf_counter() - t0
+        try:
+            prof.save(store)
+            logging.info("Perfil salvo: %s (%s, %.0f ms)", prof.name, label, prof.wall_s * 1000)
+        except Exception:
+            logging.exception("Falha ao salvar o perfil %s", prof.name)
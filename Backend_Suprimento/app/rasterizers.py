@@ -0,0 +1,119 @@
+import os
+import logging
+import typing
+
+from .budget import BudgetExceeded
+from .profiling import external_timer
+from .text_backends import PDFIUM_LOCK
+
+if typing.TYPE_CHECKING:
+    from PIL import Image
+
+
+# =========================
+# Config
+# =========================
+# poppler (padrão, pdftocairo em subprocesso) | pdfium (em processo, pypdfium2)
+RASTER_BACKEND = os.getenv("PDF_RASTER_BACKEND", "poppler")
+
+
+#pdf2image (e o PIL junto) só é importado na primeira rasterização: PDF vetorial não paga
+def convert_from_path(*args, **kwargs):
+    from pdf2image import convert_from_path as _convert
+    from pdf2image.exceptions import PDFPopplerTimeoutError
+    try:
+        with external_timer("poppler"):
+            return _convert(*args, **kwargs)
+    except PDFPopplerTimeoutError as e:
+        raise BudgetExceeded("deadline", "poppler") from e
+
+
+# =====================================
+# Rasterizadores de página (imagem em tons de cinza para o OCR)
+# =====================================
+class PopplerRaster:
+    """
+    pdftocairo via pdf2image: um processo por chamada, JPEG em disco e decode de
+    volta no PIL. Sempre rasteriza a página inteira; a faixa é recortada depois.
+    """
+    name = "poppler"
+
+    def __init__(self, pdf_path: str, doc=None):
+        self.pdf_path = pdf_path
+
+    def render(self, i: int, dpi: int, y0: float = 0.0, y1: float = 1.0,
+               timeout: typing.Optional[float] = None) -> typing.Optional["Image.Image"]:
+        pages = convert_from_path(
+            self.pdf_path,
+            dpi=dpi,
+            first_page=i+1,
+            last_page=i+1,
+            grayscale = True,
+            fmt="jpeg",              # menor memória
+            thread_count=1,
+            use_pdftocairo=True,
+            timeout=timeout,
+        )
+        if not pages:
+            return None
+        img = pages[0].convert("L")
+        if (y0, y1) != (0.0, 1.0):
+            w, h = img.size
+            img = img.crop((0, int(h * y0), w, int(h * y1)))
+        return img
+
+    def close(self):
+        pass
+
+
+class PdfiumRaster:
+    """
+    PDFium (pypdfium2) no próprio processo: renderiza direto num bitmap em tons de
+    cinza, só a faixa pedida, sem fork nem JPEG. Reaproveita o PdfDocument do
+    backend de texto pdfium quando ele já está aberto. Não tem timeout (o orçamento
+    é checado antes) e, pelo PDFIUM_LOCK, threads do mesmo worker renderizam uma por vez.
+    """
+    name = "pdfium"
+
+    def __init__(self, pdf_path: str, doc=None):
+        import pypdfium2 as pdfium
+        self._own = doc is None
+        with PDFIUM_LOCK:
+            self.doc = pdfium.PdfDocument(pdf_path) if self._own else doc
+
+    def render(self, i: int, dpi: int, y0: float = 0.0, y1: float = 1.0,
+               timeout: typing.Optional[float] = None) -> typing.Optional["Image.Image"]:
+        with external_timer("pdfium"), PDFIUM_LOCK:
+            page = self.doc[i]
+            try:
+                h = page.get_height()
+                # crop = quanto cortar de cada lado (esq, baixo, dir, cima), em pontos
+                bitmap = page.render(scale=dpi / 72, grayscale=True,
+                                     crop=(0, h * (1.0 - y1), 0, h * y0))
+                img = bitmap.to_pil()
+                bitmap.close()
+            finally:
+                page.close()
+        return img if img.mode == "L" else img.convert("L")
+
+    def close(self):
+        if self._own:
+            with PDFIUM_LOCK:
+                self.doc.close()
+
+
+RASTER_BACKENDS = {b.name: b for b in (PopplerRaster, PdfiumRaster)}
+
+
+def open_rasterizer(name: str, pdf_path: str, doc=None) -> PopplerRaster:
+    """Abre o rasterizador pedido (doc = PdfDocument já aberto); sem pypdfium2, cai para o poppler."""
+    cls = RASTER_BACKENDS.get(name)
+    if cls is None:
+        raise ValueError(f"Rasterizador desconhecido: {name!r} (opções: {', '.join(RASTER_BACKENDS)})")
+    try:
+        return cls(pdf_path, doc)
+    except Exception as e:
+        if cls is PopplerRaster:
+            raise
+        logging.warning("Rasterizador %s indisponível (%s); usando poppler", name, e)
+        return PopplerRaster(pdf_path)
@@ -0,0 +1,122 @@
+import os
+import time
+import logging
+import itertools
+import threading
+import typing
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+
+
+# =========================
+# Config
+# =========================
+WORKERS     = int(os.getenv("PROCESS_WORKERS", "3"))
+HEAVY_LIMIT = int(os.getenv("OCR_WORKERS", "1"))   # máx. de PDFs escaneados rodando juntos
+
+
+@dataclass(order=True)
+class _Job:
+    # prazo virtual = chegada + custo estimado: os baratos passam na frente,
+    # mas um PDF caro que espera há muito tempo acaba vencendo (sem starvation)
+    deadline: float
+    seq: int
+    fn: typing.Callable = field(compare=False)
+    args: tuple = field(compare=False)
+    future: Future = field(compare=False)
+    heavy: bool = field(compare=False)
+
+
+# =====================================
+# Pool compartilhado por /upload e /upload/batch
+# =====================================
+class JobScheduler:
+    """
+    Threads de processamento com fila por prazo virtual (earliest deadline first).
+    Jobs "pesados" (OCR) ocupam no máximo `heavy_limit` threads, então sempre
+    sobra thread para PDFs vetoriais.
+    """
+
+    def __init__(self, workers: int = WORKERS, heavy_limit: int = HEAVY_LIMIT):
+        self.workers = max(1, workers)
+        self.heavy_limit = max(1, min(heavy_limit, self.workers))
+        self._cv = threading.Condition()
+        self._queue: list[_Job] = []
+        self._seq = itertools.count()
+        self._running = 0
+        self._heavy_running = 0
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"job-{n}", daemon=True)
+            for n in range(self.workers)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, fn: typing.Callable, *args, cost_s: float = 0.0, heavy: bool = False) -> Future:
+        fut: Future = Future()
+        with self._cv:
+            if self._closed:
+                raise RuntimeError("scheduler encerrado")
+            self._queue.append(_Job(time.monotonic() + cost_s, next(self._seq), fn, args, fut, heavy))
+            self._cv.notify()
+        return fut
+
+    def _next_job(self) -> typing.Optional[_Job]:
+        with self._cv:
+            while True:
+                if self._closed and not self._queue:
+                    return None
+                heavy_ok = self._heavy_running < self.heavy_limit
+                for job in sorted(self._queue):
+                    if heavy_ok or not job.heavy:
+                        self._queue.remove(job)
+                        self._running += 1
+                        if job.heavy:
+                            self._heavy_running += 1
+                        return job
+                self._cv.wait()
+
+    def _finish(self, job: _Job):
+        with self._cv:
+            self._running -= 1
+            if job.heavy:
+                self._heavy_running -= 1
+            self._cv.notify_all()
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            try:
+                if not job.future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    job.future.set_result(job.fn(*job.args))
+                except BaseException as e:
+                    job.future.set_exception(e)
+            except Exception:
+                logging.exception("Erro inesperado no worker do scheduler")
+            finally:
+                self._finish(job)
+
+    def shutdown(self, cancel: bool = True):
+        with self._cv:
+            self._closed = True
+            if cancel:
+                for job in self._queue:
+                    job.future.cancel()
+                self._queue.clear()
+            self._cv.notify_all()
+
+    def stats(self) -> dict:
+        with self._cv:
+            return {
+                "workers": self.workers,
+                "heavy_limit": self.heavy_limit,
+                "queued": len(self._queue),
+                "queued_heavy": sum(1 for j in self._queue if j.heavy),
+                "running": self._running,
+                "running_heavy": self._heavy_running,
+            }
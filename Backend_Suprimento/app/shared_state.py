@@ -0,0 +1,92 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import typing
+
+from .artifacts import ARTIFACT_DIR
+
+
+# =========================
+# Config
+# =========================
+# Um arquivo sqlite no diretório de artefatos: visível para todos os workers do gunicorn
+STATE_DB         = os.getenv("STATE_DB", os.path.join(ARTIFACT_DIR, ".state.sqlite"))
+STATE_TIMEOUT_S  = 10.0    # espera pelo lock de escrita de outro worker
+STATE_PURGE_EVERY = 200    # a cada N escritas apaga as chaves vencidas
+
+
+# =====================================
+# Estado compartilhado entre processos (KV com TTL + contadores)
+# =====================================
+class SharedState:
+    """
+    Cache chave/valor (JSON) com expiração e contadores atômicos, em sqlite WAL.
+    Seguro para vários processos (workers) e várias threads: cada thread de cada
+    processo abre a sua própria conexão.
+    """
+
+    def __init__(self, path: str = STATE_DB):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conn() as c:
+            c.execute("CREATE TABLE IF NOT EXISTS kv (k TEXT PRIMARY KEY, v TEXT NOT NULL, expires REAL)")
+            c.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # conexão herdada de um fork não pode ser reutilizada no filho
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=STATE_TIMEOUT_S, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    # ---------- KV ----------
+    def get(self, key: str) -> typing.Any:
+        row = self._conn().execute(
+            "SELECT v FROM kv WHERE k = ? AND (expires IS NULL OR expires > ?)", (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: typing.Any, ttl_s: typing.Optional[float] = None) -> None:
+        expires = time.time() + ttl_s if ttl_s else None
+        c = self._conn()
+        c.execute("INSERT OR REPLACE INTO kv (k, v, expires) VALUES (?, ?, ?)",
+                  (key, json.dumps(value, ensure_ascii=False), expires))
+        self._writes += 1
+        if self._writes % STATE_PURGE_EVERY == 0:
+            self.purge()
+
+    def touch(self, key: str, ttl_s: float) -> bool:
+        """Renova a expiração de uma chave ainda viva; False se ela não existe (ou expirou)."""
+        now = time.time()
+        cur = self._conn().execute(
+            "UPDATE kv SET expires = ? WHERE k = ? AND (expires IS NULL OR expires > ?)", (now + ttl_s, key, now)
+        )
+        return cur.rowcount > 0
+
+    def delete(self, key: str) -> None:
+        self._conn().execute("DELETE FROM kv WHERE k = ?", (key,))
+
+    def purge(self) -> int:
+        cur = self._conn().execute("DELETE FROM kv WHERE expires IS NOT NULL AND expires <= ?", (time.time(),))
+        return cur.rowcount
+
+    # ---------- Contadores ----------
+    def incr(self, name: str, n: int = 1) -> None:
+        self._conn().execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, n),
+        )
+
+    def counters(self, prefix: str = "") -> dict[str, int]:
+        rows = self._conn().execute(
+            "SELECT name, value FROM counters WHERE name LIKE ? ORDER BY name", (prefix + "%",)
+        ).fetchall()
+        return {name[len(prefix):]: value for name, value in rows}
@@ -0,0 +1,179 @@
+import os
+import shutil
+import logging
+import threading
+import subprocess
+import typing
+
+
+# =========================
+# Config
+# =========================
+# pdfplumber (padrão, layout do pdfminer em Python puro) | pdftotext (poppler) | pdfium
+TEXT_BACKEND = os.getenv("PDF_TEXT_BACKEND", "pdfplumber")
+PDFTOTEXT_TIMEOUT_S = 120
+
+# O PDFium não é thread-safe: toda chamada passa por este lock
+PDFIUM_LOCK = threading.RLock()
+PDFIUM_BAND_CHUNK = 64     # chars por bloco testado de uma vez no recorte do rodapé
+
+
+# =====================================
+# Backends de texto vetorial
+# =====================================
+class PlumberText:
+    """Texto página a página via pdfplumber (pdfminer)."""
+    name = "pdfplumber"
+
+    def __init__(self, pdf_path: str, pdf):
+        self.pdf_path = pdf_path
+        self.pdf = pdf
+
+    def pages_text(self) -> list[str]:
+        return [page.extract_text() or "" for page in self.pdf.pages]
+
+    def footer_texts(self, frac: float) -> list[str]:
+        """Texto vetorial da faixa inferior (`frac` da altura) de todas as páginas."""
+        return [plumber_band_text(page, frac) for page in self.pdf.pages]
+
+    def close(self):
+        pass
+
+
+def plumber_band_text(page, frac: float) -> str:
+    """
+    Faixa inferior de uma página do pdfplumber direto dos chars já extraídos:
+    mesmo resultado de page.within_bbox(...).extract_text(), sem montar uma
+    CroppedPage (que refiltra todos os objetos da página) por rodapé.
+    """
+    from pdfplumber import utils
+    w, h = page.width, page.height
+    y0 = h * (1 - frac)
+    # mesmo critério do utils.within_bbox (caixa inteira dentro, bordas inclusas), sem o
+    # cálculo genérico de interseção por objeto que domina o tempo em página cheia
+    chars = [c for c in page.chars
+             if c["top"] >= y0 and c["bottom"] <= h and c["x0"] >= 0 and c["x1"] <= w]
+    if not chars:
+        return ""
+    txt = utils.extract_text(chars, x_tolerance=0.5, y_tolerance=0.5) or ""
+    if not txt.strip():
+        words = utils.extract_words(chars, x_tolerance=0.5, y_tolerance=0.5) or []
+        txt = " ".join(wd["text"] for wd in words)
+    return txt
+
+
+class PdftotextText(PlumberText):
+    """`pdftotext -layout` do poppler: um único processo para o documento inteiro."""
+    name = "pdftotext"
+
+    def __init__(self, pdf_path: str, pdf):
+        super().__init__(pdf_path, pdf)
+        if not shutil.which("pdftotext"):
+            raise RuntimeError("pdftotext não encontrado no PATH")
+
+    def pages_text(self) -> list[str]:
+        proc = subprocess.run(
+            ["pdftotext", "-layout", "-enc", "UTF-8", self.pdf_path, "-"],
+            capture_output=True, timeout=PDFTOTEXT_TIMEOUT_S, check=True,
+        )
+        # uma página por form feed; o último \f é seguido de string vazia
+        pages = proc.stdout.decode("utf-8", errors="replace").split("\f")
+        n = len(self.pdf.pages)
+        pages = [p.rstrip() for p in pages[:n]]
+        return pages + [""] * (n - len(pages))
+
+
+class PdfiumText(PlumberText):
+    """PDFium (pypdfium2): extração em C; o rodapé sai da caixa de cada caractere."""
+    name = "pdfium"
+
+    def __init__(self, pdf_path: str, pdf):
+        super().__init__(pdf_path, pdf)
+        import pypdfium2 as pdfium
+        with PDFIUM_LOCK:
+            self.doc = pdfium.PdfDocument(pdf_path)
+        self._textpages: dict[int, typing.Any] = {}
+
+    def _textpage(self, i: int):
+        if i not in self._textpages:
+            self._textpages[i] = self.doc[i].get_textpage()
+        return self._textpages[i]
+
+    def pages_text(self) -> list[str]:
+        out = []
+        with PDFIUM_LOCK:
+            for i in range(len(self.doc)):
+                txt = self._textpage(i).get_text_bounded() or ""
+                out.append(txt.replace("\r\n", "\n").replace("\r", "\n"))
+        return out
+
+    def footer_texts(self, frac: float) -> list[str]:
+        out = []
+        with PDFIUM_LOCK:
+            for i in range(len(self.doc)):
+                w, h = self.doc[i].get_size()
+                out.append(pdfium_band_text(self._textpage(i), w, h, frac))
+        return out
+
+    def close(self):
+        with PDFIUM_LOCK:
+            for tp in self._textpages.values():
+                tp.close()
+            self._textpages.clear()
+            self.doc.close()
+
+
+def pdfium_band_text(textpage, w: float, h: float, frac: float) -> str:
+    """
+    Faixa inferior de uma página do PDFium com o critério do plumber_band_text: só
+    entra o caractere com a caixa inteira dentro da faixa. O get_text_bounded inclui
+    a linha que só encosta na borda, e aí o rodapé ganha a última linha do corpo.
+    A caixa "loose" (altura da fonte) é a que bate com o top/bottom do pdfminer.
+    As linhas saem na ordem do conteúdo, não da posição como no pdfplumber.
+    Chamar com o PDFIUM_LOCK.
+    """
+    import ctypes
+    import pypdfium2.raw as pdfium_c
+    tp = textpage.raw
+    top = h * frac          # coordenadas PDF: origem no canto inferior esquerdo
+    box = pdfium_c.FS_RECTF()
+    l, t, r, b = (ctypes.c_double() for _ in range(4))
+    n = pdfium_c.FPDFText_CountChars(tp)
+    out = []
+    for ini in range(0, n, PDFIUM_BAND_CHUNK):
+        qtd = min(PDFIUM_BAND_CHUNK, n - ini)
+        # bloco inteiro acima da faixa (retângulos do PDFium, em C): pula sem olhar char a char
+        rects = pdfium_c.FPDFText_CountRects(tp, ini, qtd)
+        baixo = min((b.value for k in range(rects) if pdfium_c.FPDFText_GetRect(tp, k, l, t, r, b)),
+                    default=None)
+        if baixo is not None and baixo > top:
+            if out and out[-1] != "\n":
+                out.append("\n")
+            continue
+        for k in range(ini, ini + qtd):
+            if pdfium_c.FPDFText_IsGenerated(tp, k):
+                # quebra de linha que o PDFium gera entre linhas: só entre chars da faixa
+                if out and out[-1] != "\n":
+                    out.append("\n")
+                continue
+            pdfium_c.FPDFText_GetLooseCharBox(tp, k, box)
+            if box.bottom >= 0 and box.top <= top and box.left >= 0 and box.right <= w:
+                out.append(chr(pdfium_c.FPDFText_GetUnicode(tp, k)))
+    return "".join(out).replace("\r", "").strip("\n")
+
+
+TEXT_BACKENDS = {b.name: b for b in (PlumberText, PdftotextText, PdfiumText)}
+
+
+def open_text_backend(name: str, pdf_path: str, pdf) -> PlumberText:
+    """Abre o backend pedido; se ele não estiver disponível, cai para o pdfplumber."""
+    cls = TEXT_BACKENDS.get(name)
+    if cls is None:
+        raise ValueError(f"Backend de texto desconhecido: {name!r} (opções: {', '.join(TEXT_BACKENDS)})")
+    try:
+        return cls(pdf_path, pdf)
+    except Exception as e:
+        if cls is PlumberText:
+            raise
+        logging.warning("Backend de texto %s indisponível (%s); usando pdfplumber", name, e)
+        return PlumberText(pdf_path, pdf)
@@ -0,0 +1,73 @@
+import time
+import logging
+import typing
+
+
+# Texto de exemplo que passa por todos os extratores de texto: as regex montadas
+# dentro das funções entram no cache do `re` já no warm-up.
+AMOSTRA = """
+Processo 0800123-52.2023.8.18.0140
+REQUERENTE: Maria da Silva Santos
+A requerente é filha de JOSÉ DA SILVA SANTOS, falecido em Teresina-PI, em 17 de janeiro de 2024.
+Certidão de óbito: causa mortis indeterminada.
+12345 10/02/2024 10:11 Parecer Parecer
+678
+Num. 1234567 - Pág. 1
+"""
+
+
+def _patterns():
+    """Importa processing (pdfplumber/pdfminer + regex do módulo) e roda os extratores de texto."""
+    from . import processing as P
+    P.extract_numero_processo(AMOSTRA)
+    P.cnj_valido("0800123-52.2023.8.18.0140")
+    P.extract_requerente(AMOSTRA)
+    P.extract_parentesco_e_falecido(AMOSTRA)
+    P.extract_local_obito(AMOSTRA)
+    P.extract_data_obito(AMOSTRA)
+    P.to_br_date(AMOSTRA)
+    P.extract_id_parecer_paginas([AMOSTRA])
+    P._extrai_id_pag(AMOSTRA)
+    P._explain_page(AMOSTRA)
+
+
+def _imaging():
+    """numpy, PIL e pdf2image (usados na primeira página que precisar de OCR)."""
+    import numpy  # noqa: F401
+    import pdf2image  # noqa: F401
+    from PIL import Image  # noqa: F401
+
+
+def _ocr():
+    """OCR de uma imagem minúscula: carrega o modelo do tesseract (ou o pool do tesserocr)."""
+    from PIL import Image, ImageDraw
+    from .ocr_engine import image_to_string
+    img = Image.new("L", (160, 40), 255)
+    ImageDraw.Draw(img).text((8, 12), "Suprimento 123", fill=0)
+    image_to_string(img, psm=7)
+
+
+def warm_up(odt_generator=None) -> dict[str, typing.Optional[float]]:
+    """
+    Paga no boot o que o primeiro request pagaria: imports pesados, regex,
+    template ODT e modelo do OCR. Cada etapa é independente; uma falha (ex.:
+    tesseract ausente) só é registrada. Retorna ms por etapa (None = falhou).
+    """
+    etapas: list[tuple[str, typing.Callable[[], None]]] = [
+        ("patterns", _patterns),
+        ("imaging", _imaging),
+    ]
+    if odt_generator is not None:
+        etapas.append(("odt_template", odt_generator.warm_up))
+    etapas.append(("ocr", _ocr))
+
+    tempos: dict[str, typing.Optional[float]] = {}
+    for nome, fn in etapas:
+        t0 = time.perf_counter()
+        try:
+            fn()
+            tempos[nome] = round((time.perf_counter() - t0) * 1000, 1)
+        except Exception as e:
+            logging.warning("Warm-up %s falhou: %s", nome, e)
+            tempos[nome] = None
+    return tempos
@@ -0,0 +1,31 @@
+# Configuração do gunicorn para o modo multi-processo
+#   gunicorn -c gunicorn.conf.py app.main:app
+# Cada worker é um processo uvicorn com o seu próprio pool de threads
+# (PROCESS_WORKERS); caches e contadores ficam no sqlite do ARTIFACT_DIR.
+import os
+import resource
+import multiprocessing
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+worker_class = "uvicorn_worker.UvicornWorker"
+# padrão: um worker por núcleo (a extração vetorial é CPU-bound e presa ao GIL)
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+timeout = int(os.getenv("WORKER_TIMEOUT_S", "300"))        # PDFs escaneados longos
+graceful_timeout = 30
+keepalive = 5
+# recicla workers de tempos em tempos (fragmentação de memória do PIL/pdfminer)
+max_requests = int(os.getenv("MAX_REQUESTS", "500"))
+max_requests_jitter = 50
+accesslog = "-"
+
+
+# Teto de memória virtual por worker (0 = sem teto). Acima do MAX_RSS_MB checado
+# pela extração: alocação que passar disso vira MemoryError (resultado parcial),
+# não OOM-kill da instância inteira.
+WORKER_RLIMIT_AS_MB = int(os.getenv("WORKER_RLIMIT_AS_MB", "0"))
+
+
+def post_fork(server, worker):
+    if WORKER_RLIMIT_AS_MB:
+        limite = WORKER_RLIMIT_AS_MB * 2**20
+        resource.setrlimit(resource.RLIMIT_AS, (limite, limite))
@@ -0,0 +1,101 @@
+"""
+Compara o pipeline com e sem pré-processamento de imagem antes do OCR:
+tempo total, tempo gasto no tesseract e acerto dos campos.
+
+O corpus é uma pasta de PDFs; o gabarito de cada um, se existir, fica ao lado
+em <nome>.json com os mesmos campos de montar_resultado (id_certidoes como
+lista de "Num. X - Pág. Y").
+
+Uso (dentro de Backend_Suprimento; precisa de poppler e tesseract):
+    python scripts/bench_ocr_preprocess.py corpus/ --steps deskew,trim,binarize
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import processing as P  # noqa: E402
+from app.preprocess import parse_steps  # noqa: E402
+
+
+class OcrTimer:
+    """Envolve as chamadas de OCR usadas pelo PDFContext para somar o tempo no tesseract."""
+
+    def __init__(self):
+        self.total = 0.0
+        self.calls = 0
+        for nome in ("image_to_data",):
+            original = getattr(P, nome)
+            setattr(P, nome, self._wrap(original))
+
+    def _wrap(self, fn):
+        def timed(*a, **kw):
+            t0 = time.perf_counter()
+            try:
+                return fn(*a, **kw)
+            finally:
+                self.total += time.perf_counter() - t0
+                self.calls += 1
+        return timed
+
+    def reset(self):
+        self.total, self.calls = 0.0, 0
+
+
+def _norm(campo, valor):
+    if campo == "id_certidoes":
+        return sorted(c["rodape"] if isinstance(c, dict) else c for c in (valor or []))
+    return P.normalize_spaces(valor) if isinstance(valor, str) else valor
+
+
+def acertos(resultado: dict, gabarito: dict) -> tuple[int, int]:
+    campos = [c for c in P.CAMPOS_ORDEM if c in gabarito]
+    ok = sum(1 for c in campos if _norm(c, resultado.get(c)) == _norm(c, gabarito[c]))
+    return ok, len(campos)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("corpus")
+    ap.add_argument("--steps", default="deskew,trim,binarize")
+    args = ap.parse_args()
+
+    variantes = {"sem": (), "com": parse_steps(args.steps)}
+    timer = OcrTimer()
+    pdfs = sorted(glob.glob(os.path.join(args.corpus, "*.pdf")))
+    tot = {v: {"t": 0.0, "ocr": 0.0, "ok": 0, "n": 0} for v in variantes}
+
+    for pdf in pdfs:
+        gab_path = os.path.splitext(pdf)[0] + ".json"
+        gabarito = json.load(open(gab_path, encoding="utf-8")) if os.path.exists(gab_path) else {}
+        linha = [f"{os.path.basename(pdf):<40}"]
+        for nome, steps in variantes.items():
+            timer.reset()
+            t0 = time.perf_counter()
+            ctx = P.PDFContext(pdf, preprocess_steps=steps)
+            try:
+                res = P.montar_resultado(ctx)
+            finally:
+                ctx.close()
+            dt = time.perf_counter() - t0
+            ok, n = acertos(res, gabarito)
+            t = tot[nome]
+            t["t"] += dt; t["ocr"] += timer.total; t["ok"] += ok; t["n"] += n
+            linha.append(f"{nome}: {dt:6.1f}s (ocr {timer.total:6.1f}s, {timer.calls} chamadas) {ok}/{n}")
+        print("  ".join(linha))
+
+    print("\n== Total")
+    for nome, t in tot.items():
+        acc = f"{100 * t['ok'] / t['n']:.1f}%" if t["n"] else "sem gabarito"
+        print(f"  {nome}: {t['t']:8.1f}s  ocr {t['ocr']:8.1f}s  acerto {acc}")
+    sem, com = tot["sem"], tot["com"]
+    if sem["ocr"]:
+        print(f"  variação no tempo de OCR: {100 * (com['ocr'] - sem['ocr']) / sem['ocr']:+.1f}%")
+
+
+if __name__ == "__main__":
+    main()
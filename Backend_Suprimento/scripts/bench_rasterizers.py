@@ -0,0 +1,131 @@
+"""
+Benchmark dos rasterizadores do PDFContext (poppler vs pdfium) e equivalência do OCR.
+
+Para cada página (até --pages por PDF) mede a rasterização da página inteira no DPI do
+corpo e da faixa do rodapé no DPI do rodapé, como o PDFContext pede. Com --ocr roda o
+OCR (preprocess + tesseract) nas imagens dos dois e compara o texto e o ID "Num. X - Pág. Y"
+do rodapé; sem --ocr compara só os pixels (diferença média 0-255).
+
+Uso (dentro de Backend_Suprimento):
+    python scripts/bench_rasterizers.py corpus/*.pdf --pages 10
+    python scripts/bench_rasterizers.py corpus/*.pdf --ocr --repeat 3
+
+Sai com código 1 se, com --ocr, algum ID de rodapé divergir do primeiro backend.
+"""
+import os
+import sys
+import time
+import argparse
+import difflib
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from app.rasterizers import RASTER_BACKENDS, open_rasterizer  # noqa: E402
+from app import processing as P  # noqa: E402
+from app.ocr_engine import image_to_string  # noqa: E402
+
+FAIXA_RODAPE = 0.28      # a mesma fração do ocr_footer dos detectores
+
+
+def n_paginas(pdf_path: str) -> int:
+    import pypdfium2 as pdfium
+    doc = pdfium.PdfDocument(pdf_path)
+    try:
+        return len(doc)
+    finally:
+        doc.close()
+
+
+def renderiza(name: str, pdf_path: str, paginas: list[int], repeat: int):
+    """(backend usado, ms medianos por página inteira, ms por rodapé, imagens da última rodada)."""
+    t_pag, t_rod = [], []
+    imgs = {}
+    for _ in range(repeat):
+        raster = open_rasterizer(name, pdf_path)      # aberto a cada rodada: nada em cache
+        try:
+            for i in paginas:
+                t0 = time.perf_counter()
+                pag = raster.render(i, P.OCR_DPI_BODY)
+                t1 = time.perf_counter()
+                rod = raster.render(i, P.OCR_DPI_FOOTER, 1.0 - FAIXA_RODAPE, 1.0)
+                t2 = time.perf_counter()
+                t_pag.append(t1 - t0)
+                t_rod.append(t2 - t1)
+                imgs[i] = (pag, rod)
+        finally:
+            usado = raster.name
+            raster.close()
+    return usado, statistics.median(t_pag) * 1000, statistics.median(t_rod) * 1000, imgs
+
+
+def diff_pixels(a, b) -> float:
+    """Diferença média absoluta (0-255); tamanhos diferentes em 1 px são igualados."""
+    if a.size != b.size:
+        b = b.resize(a.size)
+    return float(np.abs(np.asarray(a, dtype=np.int16) - np.asarray(b, dtype=np.int16)).mean())
+
+
+def ocr(img) -> str:
+    img, _ = P.preprocess(img, P.PREPROCESS_STEPS)
+    return image_to_string(img, psm=6) or ""
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("pdfs", nargs="+")
+    ap.add_argument("--backends", default=",".join(RASTER_BACKENDS))
+    ap.add_argument("--pages", type=int, default=5, help="páginas por PDF (0 = todas)")
+    ap.add_argument("--repeat", type=int, default=1)
+    ap.add_argument("--ocr", action="store_true")
+    args = ap.parse_args()
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+
+    divergencias = 0
+    totais: dict[str, float] = {}     # só os backends que rodaram
+    for pdf_path in args.pdfs:
+        n = n_paginas(pdf_path)
+        paginas = list(range(min(n, args.pages) if args.pages else n))
+        print(f"\n== {os.path.basename(pdf_path)} ({len(paginas)}/{n} páginas)")
+        ref = None
+        for name in backends:
+            try:
+                usado, ms_pag, ms_rod, imgs = renderiza(name, pdf_path, paginas, args.repeat)
+            except Exception as e:
+                print(f"  {name:<8} falhou: {e}")
+                continue
+            totais[name] = totais.get(name, 0.0) + (ms_pag + ms_rod) * len(paginas)
+            nota = "" if usado == name else f" (indisponível, usou {usado})"
+            print(f"  {name:<8} página {ms_pag:8.1f} ms  rodapé {ms_rod:8.1f} ms{nota}")
+            if ref is None:
+                ref = (name, imgs)
+                continue
+            dif = [diff_pixels(ref[1][i][k], imgs[i][k]) for i in paginas for k in (0, 1)]
+            print(f"    pixels vs {ref[0]}: diferença média {statistics.mean(dif):.2f}, máx {max(dif):.2f}")
+            if not args.ocr:
+                continue
+            sims = []
+            for i in paginas:
+                sims.append(difflib.SequenceMatcher(None, ocr(ref[1][i][0]), ocr(imgs[i][0])).ratio())
+                id_ref, id_new = P._extrai_id_pag(ocr(ref[1][i][1])), P._extrai_id_pag(ocr(imgs[i][1]))
+                if id_ref != id_new:
+                    divergencias += 1
+                    print(f"    ≠ rodapé pág. {i + 1}: {ref[0]}={id_ref!r}  {name}={id_new!r}")
+            print(f"    OCR da página vs {ref[0]}: similaridade média {statistics.mean(sims):.3f}, "
+                  f"mín {min(sims):.3f}")
+
+    print("\n== Total")
+    if totais:
+        ref_total = next(iter(totais))
+        base = totais[ref_total] or 1e-9
+        for name, total in totais.items():
+            print(f"  {name:<8} {total:9.1f} ms  ({base / (total or 1e-9):5.2f}x vs {ref_total})")
+    if args.ocr:
+        print(f"\nDivergências de ID no rodapé: {divergencias}")
+    sys.exit(1 if divergencias else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Mede o custo de cold start do serviço:
+
+  1. import de app.main num processo novo (mediana de --repeat execuções);
+  2. com --importtime, os módulos que mais pesam nesse import (python -X importtime);
+  3. boot do uvicorn até o primeiro 200 em GET / e, se um PDF for passado,
+     a latência do primeiro /upload, com WARMUP=0 e WARMUP=1.
+
+Uso (dentro de Backend_Suprimento):
+    python scripts/bench_startup.py amostra.pdf --repeat 5 --importtime
+"""
+import os
+import sys
+import time
+import signal
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+import httpx
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = (
+    "import time; t0 = time.perf_counter(); import app.main; "
+    "print((time.perf_counter() - t0) * 1000)"
+)
+
+
+def tempo_import(env: dict) -> float:
+    out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=RAIZ, env=env,
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def top_imports(env: dict, n: int = 15) -> list[tuple[int, str]]:
+    """Módulos de maior tempo acumulado (µs) no import de app.main."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"],
+                         cwd=RAIZ, env=env, capture_output=True, text=True, check=True)
+    linhas = []
+    for ln in out.stderr.splitlines():
+        partes = ln.split("|")
+        if len(partes) == 3 and partes[1].strip().isdigit():
+            linhas.append((int(partes[1]), partes[2].rstrip()))
+    return sorted(linhas, reverse=True)[:n]
+
+
+def boot_e_primeiro_upload(env: dict, port: int, pdf: bytes = None) -> tuple[float, float, float]:
+    """(ms até o 1º 200 em GET /, ms do 1º /upload, ms do 2º /upload); uploads = nan sem PDF."""
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError("servidor encerrou no boot")
+            try:
+                if httpx.get(base + "/", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                time.sleep(0.01)
+        boot = (time.perf_counter() - t0) * 1000
+        if pdf is None:
+            return boot, float("nan"), float("nan")
+        lat = []
+        for _ in range(2):
+            t1 = time.perf_counter()
+            httpx.post(base + "/upload", files={"file": ("cold.pdf", pdf, "application/pdf")}, timeout=600)
+            lat.append((time.perf_counter() - t1) * 1000)
+        return boot, lat[0], lat[1]
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=30)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("pdf", nargs="?")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--port", type=int, default=8766)
+    ap.add_argument("--importtime", action="store_true")
+    args = ap.parse_args()
+    pdf = open(args.pdf, "rb").read() if args.pdf else None
+
+    with tempfile.TemporaryDirectory() as artifact_dir:
+        env = {**os.environ, "ARTIFACT_DIR": artifact_dir, "RESULT_CACHE_TTL_S": "0"}
+
+        tempos = [tempo_import(env) for _ in range(args.repeat)]
+        print(f"import app.main: mediana {statistics.median(tempos):.0f} ms "
+              f"(min {min(tempos):.0f}, max {max(tempos):.0f}, n={len(tempos)})")
+
+        if args.importtime:
+            print("\n== Módulos mais caros (acumulado)")
+            for us, nome in top_imports(env):
+                print(f"  {us / 1000:8.1f} ms  {nome}")
+
+        print(f"\n{'WARMUP':>6} {'boot ms':>9} {'1º upload ms':>13} {'2º upload ms':>13}")
+        for warm in ("0", "1"):
+            res = [boot_e_primeiro_upload({**env, "WARMUP": warm}, args.port, pdf)
+                   for _ in range(args.repeat)]
+            boot, up1, up2 = (statistics.median(col) for col in zip(*res))
+            print(f"{warm:>6} {boot:>9.0f} {up1:>13.0f} {up2:>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
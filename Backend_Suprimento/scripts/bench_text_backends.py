@@ -0,0 +1,112 @@
+"""
+Benchmark dos backends de texto do PDFContext e equivalência campo a campo com o pdfplumber.
+
+Só mede/compara o texto vetorial (nenhum OCR é executado), então roda sem tesseract.
+
+Uso (dentro de Backend_Suprimento):
+    python scripts/bench_text_backends.py corpus/*.pdf
+    python scripts/bench_text_backends.py corpus/*.pdf --backends pdfplumber,pdfium --repeat 3
+
+Sai com código 1 se algum campo ou a faixa do rodapé divergir do pdfplumber.
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdfplumber  # noqa: E402
+
+from app.text_backends import TEXT_BACKENDS, open_text_backend  # noqa: E402
+from app import processing as P  # noqa: E402
+
+
+def campos_vetoriais(pages: list[str]) -> dict:
+    """Os campos que saem só do texto vetorial (os mesmos extratores de montar_resultado)."""
+    full_text = "\n\n".join(pages)
+    par, fal = P.extract_parentesco_e_falecido(full_text)
+    return {
+        "numero_processo": P.extract_numero_processo(full_text),
+        "requerente":      P.extract_requerente(full_text),
+        "parentesco":      par,
+        "nome_falecido":   fal,
+        "local_obito":     P.fix_local_obito_uf(P.extract_local_obito(full_text)),
+        "data":            P.extract_data_obito(full_text),
+        "id_parecer":      P.extract_id_parecer(full_text),
+    }
+
+
+def rodape(backend) -> tuple[dict, list]:
+    """
+    IDs "Num. X - Pág. Y" por página e as palavras da faixa do rodapé (ordenadas: o
+    pdfium segue a ordem do conteúdo, o pdfplumber a posição das linhas). As palavras
+    pegam linha atravessando a borda da faixa, que o ID sozinho não mostra.
+    """
+    ids, palavras = {}, []
+    for i, txt in enumerate(backend.footer_texts(P.FOOTER_FRAC)):
+        idp = P._extrai_id_pag(txt)
+        if idp:
+            ids[i + 1] = idp
+        palavras.append(sorted(txt.split()))
+    return ids, palavras
+
+
+def run_backend(name: str, pdf_path: str, repeat: int):
+    tempos = []
+    for _ in range(repeat):
+        with pdfplumber.open(pdf_path) as pdf:   # PDF novo a cada rodada: nada em cache
+            backend = open_text_backend(name, pdf_path, pdf)
+            t0 = time.perf_counter()
+            pages = backend.pages_text()
+            tempos.append(time.perf_counter() - t0)
+            ids_rod, palavras_rod = rodape(backend)
+            usado = backend.name
+            backend.close()
+    return usado, statistics.median(tempos), campos_vetoriais(pages), ids_rod, palavras_rod
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("pdfs", nargs="+")
+    ap.add_argument("--backends", default=",".join(TEXT_BACKENDS))
+    ap.add_argument("--repeat", type=int, default=1)
+    args = ap.parse_args()
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+
+    divergencias = 0
+    totais = {b: 0.0 for b in backends}
+    for pdf_path in args.pdfs:
+        print(f"\n== {os.path.basename(pdf_path)}")
+        ref = None
+        for name in backends:
+            usado, dt, campos, ids_rod, palavras_rod = run_backend(name, pdf_path, args.repeat)
+            totais[name] += dt
+            nota = "" if usado == name else f" (indisponível, usou {usado})"
+            print(f"  {name:<11} {dt*1000:9.1f} ms{nota}")
+            if ref is None:
+                ref = (name, campos, ids_rod, palavras_rod)
+                continue
+            for campo, valor in campos.items():
+                if valor != ref[1][campo]:
+                    divergencias += 1
+                    print(f"    ≠ {campo}: {ref[0]}={ref[1][campo]!r}  {name}={valor!r}")
+            if ids_rod != ref[2]:
+                divergencias += 1
+                print(f"    ≠ rodapé: {ref[0]}={ref[2]}  {name}={ids_rod}")
+            for i, (a, b) in enumerate(zip(ref[3], palavras_rod)):
+                if a != b:
+                    divergencias += 1
+                    print(f"    ≠ faixa do rodapé pág. {i + 1}: {ref[0]}={' '.join(a)!r}  {name}={' '.join(b)!r}")
+
+    print("\n== Total")
+    base = totais[backends[0]] or 1e-9
+    for name in backends:
+        print(f"  {name:<11} {totais[name]*1000:9.1f} ms  ({base / (totais[name] or 1e-9):5.2f}x vs {backends[0]})")
+    print(f"\nDivergências de campo: {divergencias}")
+    sys.exit(1 if divergencias else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Confere que extract_id_parecer_paginas (só páginas com a âncora da tabela do PJe, de trás
+para frente) devolve o mesmo ID que extract_id_parecer sobre o texto inteiro.
+
+Duas partes, ambas determinísticas:
+  1. fixtures fixas, com o ID esperado hoje (sufixo na linha seguinte, quebra de página,
+     linhas-isca parecidas com a tabela, parecer em página anterior, nenhum parecer);
+  2. --casos páginas geradas com semente fixa (linhas da tabela, sufixos, iscas, quebras).
+
+Uso (dentro de Backend_Suprimento):
+    python scripts/check_id_parecer.py
+    python scripts/check_id_parecer.py --casos 10000 --seed 7
+
+Sai com código 1 se algum caso divergir.
+"""
+import os
+import sys
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import processing as P  # noqa: E402
+
+
+def linha(id5: str, tipo: str, doc: str = "Documento", data: str = "10/02/2024", hora: str = "10:11") -> str:
+    return f"{id5} {data} {hora} {doc} {tipo}"
+
+
+# (nome, páginas, ID esperado)
+FIXTURES = [
+    ("parecer simples",
+     ["Capa do processo", linha("12345", "Parecer")], "12345"),
+    ("sufixo na linha seguinte",
+     [linha("12345", "Petição Inicial") + "\n" + linha("54321", "Parecer do MP") + "\n678"], "54321678"),
+    ("último parecer da tabela vence",
+     [linha("11111", "Parecer") + "\n222\n" + linha("33333", "Despacho") + "\n" + linha("44444", "Manifestação")],
+     "44444"),
+    ("parecer na página anterior, só despachos depois",
+     [linha("55555", "Parecer") + "\n999", linha("66666", "Despacho") + "\n" + linha("77777", "Certidão")],
+     "55555999"),
+    ("sufixo não atravessa quebra de página",
+     [linha("88888", "Parecer"), "123\nTexto da página seguinte"], "88888"),
+    ("isca: tipo no meio do texto, sem âncora",
+     ["O Ministério Público emitiu Parecer favorável em 10/02/2024",
+      linha("24680", "Parecer") + "\n135"], "24680135"),
+    ("isca: âncora sem tipo reconhecido no fim",
+     [linha("13579", "Parecer") + "\n" + "97531 11/02/2024 09:00 Parecer anexado em separado"], "13579"),
+    ("isca: sufixo com 4 dígitos",
+     [linha("10101", "Parecer") + "\n2020"], "10101"),
+    ("manifestação sem acento",
+     [linha("31313", "Manifestacao do Ministerio Publico") + "\n414"], "31313414"),
+    ("espaços extras na linha da tabela",
+     ["  " + linha("42424", "Parecer", doc="Parecer   do   MP").replace(" ", "  ") + "  \n  555  "], "42424555"),
+    ("nenhum parecer",
+     [linha("12121", "Petição") + "\n" + linha("34343", "Despacho")], None),
+    ("documento vazio",
+     ["", ""], None),
+]
+
+TIPOS = ["Parecer", "Parecer do MP", "Manifestação", "Manifestacao do Ministerio Publico",
+         "Petição Inicial", "Petição", "Certidão", "Intimação", "Despacho", "Sistema"]
+ISCAS = [
+    "Parecer do Ministério Público em anexo",
+    "12345 10/02/2024 10:11",
+    "123",
+    "Num. 1234567 - Pág. 1",
+    "99999 10/02/2024 10:11 Parecer com texto depois do tipo",
+    "",
+]
+
+
+def pagina_aleatoria(rnd: random.Random) -> str:
+    linhas = []
+    for _ in range(rnd.randint(0, 12)):
+        r = rnd.random()
+        if r < 0.45:
+            linhas.append(linha(f"{rnd.randint(0, 99999):05d}", rnd.choice(TIPOS), doc=rnd.choice(["Doc", "Parecer MP", "x y"])))
+            if rnd.random() < 0.5:
+                linhas.append(f"{rnd.randint(0, 999):03d}")
+        elif r < 0.7:
+            linhas.append(rnd.choice(ISCAS))
+        else:
+            linhas.append("texto corrido " * rnd.randint(1, 5))
+    return "\n".join(linhas)
+
+
+def confere(pages: list[str]) -> tuple[str, str]:
+    return P.extract_id_parecer("\n\n".join(pages)), P.extract_id_parecer_paginas(pages)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--casos", type=int, default=3000)
+    ap.add_argument("--seed", type=int, default=36)
+    args = ap.parse_args()
+
+    falhas = 0
+    for nome, pages, esperado in FIXTURES:
+        ref, novo = confere(pages)
+        ok = ref == novo == esperado
+        falhas += not ok
+        print(f"  {'ok' if ok else 'FALHOU':<7} {nome}: esperado={esperado!r} texto={ref!r} páginas={novo!r}")
+
+    rnd = random.Random(args.seed)
+    divergentes = 0
+    for n in range(args.casos):
+        pages = [pagina_aleatoria(rnd) for _ in range(rnd.randint(1, 6))]
+        ref, novo = confere(pages)
+        if ref != novo:
+            divergentes += 1
+            if divergentes <= 5:
+                print(f"  ≠ caso {n}: texto={ref!r} páginas={novo!r}\n{pages!r}")
+    print(f"\nFixtures com falha: {falhas}/{len(FIXTURES)}")
+    print(f"Casos gerados divergentes: {divergentes}/{args.casos} (seed {args.seed})")
+    sys.exit(1 if falhas or divergentes else 0)
+
+
+if __name__ == "__main__":
+    main()
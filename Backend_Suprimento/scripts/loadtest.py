@@ -0,0 +1,94 @@
+"""
+Teste de carga do /upload com 1..N workers do gunicorn.
+
+Para cada quantidade de workers sobe o servidor (gunicorn.conf.py), dispara
+`--requests` uploads do mesmo PDF com `--concurrency` clientes simultâneos e
+mede a vazão. O cache de resultados é desligado (RESULT_CACHE_TTL_S=0) para que
+todo upload seja processado de verdade.
+
+Uso (dentro de Backend_Suprimento):
+    python scripts/loadtest.py amostra.pdf --max-workers 4 --requests 40 --concurrency 8
+"""
+import os
+import sys
+import time
+import signal
+import argparse
+import tempfile
+import subprocess
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def subir_servidor(workers: int, port: int, artifact_dir: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "WEB_CONCURRENCY": str(workers),
+        "BIND": f"127.0.0.1:{port}",
+        "RESULT_CACHE_TTL_S": "0",
+        "ARTIFACT_DIR": artifact_dir,
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app"],
+        cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}/"
+    for _ in range(150):
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("servidor não respondeu")
+
+
+def disparar(port: int, pdf: bytes, total: int, concorrencia: int) -> tuple[float, list[float], int]:
+    url = f"http://127.0.0.1:{port}/upload"
+
+    def um(_):
+        t0 = time.perf_counter()
+        r = httpx.post(url, files={"file": ("carga.pdf", pdf, "application/pdf")}, timeout=600)
+        return time.perf_counter() - t0, r.status_code == 200
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(concorrencia) as ex:
+        res = list(ex.map(um, range(total)))
+    return time.perf_counter() - t0, [dt for dt, _ in res], sum(1 for _, ok in res if not ok)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("pdf")
+    ap.add_argument("--max-workers", type=int, default=os.cpu_count() or 2)
+    ap.add_argument("--requests", type=int, default=40)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--port", type=int, default=8765)
+    args = ap.parse_args()
+    pdf = open(args.pdf, "rb").read()
+
+    print(f"{'workers':>7} {'req/s':>8} {'p50 s':>7} {'p95 s':>7} {'erros':>6} {'escala':>7}")
+    base = None
+    for n in range(1, args.max_workers + 1):
+        with tempfile.TemporaryDirectory() as artifact_dir:
+            proc = subir_servidor(n, args.port, artifact_dir)
+            try:
+                disparar(args.port, pdf, min(n, args.requests), args.concurrency)   # aquecimento
+                dt, lat, erros = disparar(args.port, pdf, args.requests, args.concurrency)
+            finally:
+                proc.send_signal(signal.SIGTERM)
+                proc.wait(timeout=60)
+        vazao = args.requests / dt
+        base = base or vazao
+        lat.sort()
+        p95 = lat[min(len(lat) - 1, int(0.95 * len(lat)))]
+        print(f"{n:>7} {vazao:>8.2f} {statistics.median(lat):>7.2f} {p95:>7.2f} {erros:>6} {vazao / base:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()